@@ -1,3 +1,9 @@
+import ast
+import hashlib
+import logging
+import os
+
+from analysis.base import EventRouter
 from analysis.core_analysis import (
     CoreAnalysisConfig,
     DeadZoneAnalyzer,
@@ -10,6 +16,7 @@ from analysis.frost_analysis import (
 from analysis.items import ItemPreprocessor, TrinketPreprocessor
 from analysis.unholy_analysis import UnholyAnalysisConfig
 from console_table import EventsTable, SHOULD_PRINT
+from pipeline import Pipeline, format_timings
 from report import Fight, Report
 
 
@@ -22,53 +29,82 @@ class Analyzer:
 
     def __init__(self, fight: Fight):
         self._fight = fight
-        self._events = self._filter_events()
-        self.__spec = None
+        # (stage names, seconds) of the passes over the events
+        self._timings = []
+        self._spec = None
+        self._events = (
+            Pipeline(self._timings)
+            .stream("filter", self._filter_events)
+            .stream("detect_spec", self._detect_spec)
+            .run(self._fight.events)
+        )
         self._analysis_config = self.SPEC_ANALYSIS_CONFIGS.get(
-            self._detect_spec(),
+            self._spec,
             self.SPEC_ANALYSIS_CONFIGS["Default"],
         )()
         self._buff_tracker = None
 
-    def _get_valid_initial_rune_state(self):
+    def _detect_initial_rune_state(self, events):
+        """
+        Finds the first death rune state of the blood runes the events can be
+        replayed from without a rune spend error, falling back to no death runes.
+        All the candidate states are replayed together, as the events go by
+        """
         rune_death_states = [(False, False), (True, False), (False, True), (True, True)]
+        default_state = rune_death_states[0]
 
+        candidates = []
         for rune_death_state in rune_death_states:
             runes = self._analysis_config.create_rune_tracker()
-
-            for i, is_death in enumerate(rune_death_state):
-                runes.runes[i].is_death = is_death
-
-            for event in self._events:
-                runes.add_event(event)
-                if event.get("rune_spend_error"):
-                    break
-            else:
-                return rune_death_state
-
-        return None
-
-    def _preprocess_events(self):
+            runes.set_death_runes(rune_death_state)
+            candidates.append((rune_death_state, runes))
+
+        for event in events:
+            if candidates:
+                candidates = [
+                    (rune_death_state, runes)
+                    for rune_death_state, runes in candidates
+                    if runes.simulate(event)
+                ]
+                # Whether the default state holds up will show in the main pass
+                if len(candidates) == 1 and candidates[0][0] == default_state:
+                    candidates = []
+            yield event
+
+        self._initial_rune_state = candidates[0][0] if candidates else default_state
+
+    def _preprocess_events(self, events):
         dead_zone_analyzer = self._get_dead_zone_analyzer()
         buff_tracker = self._get_buff_tracker()
         source_id = self._fight.source.id
-        pet_analyzer = PetNameDetector()
+        pet_analyzer = self._get_pet_name_detector()
         items = self._get_item_preprocessor()
 
-        for event in self._events:
-            if event["sourceID"] == source_id or event["targetID"] == source_id:
+        for event in events:
+            if event.sourceID == source_id or event.targetID == source_id:
                 dead_zone_analyzer.preprocess_event(event)
                 buff_tracker.preprocess_event(event)
                 items.preprocess_event(event)
             pet_analyzer.preprocess_event(event)
+            yield event
 
-        for event in self._events:
+    def _decorate_events(self, events):
+        dead_zone_analyzer = self._get_dead_zone_analyzer()
+        buff_tracker = self._get_buff_tracker()
+        pet_analyzer = self._get_pet_name_detector()
+        items = self._get_item_preprocessor()
+
+        for event in events:
             dead_zone_analyzer.decorate_event(event)
             buff_tracker.decorate_event(event)
             pet_analyzer.decorate_event(event)
             items.decorate_event(event)
+            yield event
 
-        return dead_zone_analyzer
+    def _get_pet_name_detector(self):
+        if not hasattr(self, "_pet_name_detector"):
+            self._pet_name_detector = PetNameDetector()
+        return self._pet_name_detector
 
     def _get_dead_zone_analyzer(self):
         if not hasattr(self, "_dead_zone_analyzer"):
@@ -129,97 +165,84 @@ class Analyzer:
                 | set(TrinketPreprocessor.TRINKEY_MAP_BY_BUFF_NAME.keys()),
                 self._fight.duration,
                 starting_auras,
-                self._detect_spec(),
+                self._spec,
             )
         return self._buff_tracker
 
-    def _detect_spec(self):
-        if not self.__spec:
-
-            def detect():
-                for event in self._events:
-                    if event["type"] == "cast" and event["ability"] in (
-                        "Howling Blast",
-                        "Frost Strike",
-                    ):
-                        return "Frost"
-                    if event["type"] == "cast" and event["ability"] in (
-                        "Summon Gargoyle",
-                        "Ghoul Frenzy",
-                    ):
-                        return "Unholy"
-
-                # If the above doesn't work, then try with less determinate spells
-                for event in self._events:
-                    if event["type"] == "cast" and event["ability"] == "Obliterate":
-                        return "Frost"
-                    if (
-                        event["type"] == "cast"
-                        and event["ability"] == "Death and Decay"
-                    ):
-                        return "Unholy"
-
-                return None
-
-            self.__spec = detect()
-        return self.__spec
-
-    def _filter_events(self):
+    def _detect_spec(self, events):
+        spec = None
+        # In case none of those are cast, from less determinate spells
+        likely_spec = None
+
+        for event in events:
+            if spec is None and event.type == "cast":
+                if event.ability in ("Howling Blast", "Frost Strike"):
+                    spec = "Frost"
+                elif event.ability in ("Summon Gargoyle", "Ghoul Frenzy"):
+                    spec = "Unholy"
+                elif likely_spec is None:
+                    if event.ability == "Obliterate":
+                        likely_spec = "Frost"
+                    elif event.ability == "Death and Decay":
+                        likely_spec = "Unholy"
+            yield event
+
+        self._spec = spec or likely_spec
+
+    def _filter_events(self, events):
         """Remove any events we don't care to analyze or show"""
-        events = []
+        source_id = self._fight.source.id
+        pets = self._fight.source.pets
 
-        for i, event in enumerate(self._fight.events):
+        for event in events:
             # We're neither the source nor the target
             if (
-                event["sourceID"] != self._fight.source.id
-                and event["targetID"] != self._fight.source.id
-                and event["sourceID"] not in self._fight.source.pets
-                and event["targetID"] not in self._fight.source.pets
+                event.sourceID != source_id
+                and event.targetID != source_id
+                and event.sourceID not in pets
+                and event.targetID not in pets
             ):
                 continue
 
             # Don't really care about these
-            if event["type"] in ("applydebuffstack",):
+            if event.type in ("applydebuffstack",):
                 continue
 
             if (
-                event["type"] in ("refreshbuff", "applybuff", "removebuff")
-                and event["targetID"] != self._fight.source.id
-                and event["targetID"] not in self._fight.source.pets
+                event.type in ("refreshbuff", "applybuff", "removebuff")
+                and event.targetID != source_id
+                and event.targetID not in pets
             ):
                 continue
 
-            events.append(event)
-        return events
+            yield event
 
     @property
     def displayable_events(self):
-        """Remove any events we don't care to show in the UI"""
-        events = []
+        return list(self._filter_displayable_events(self._events))
 
-        for event in self._events:
-            if event["sourceID"] == self._fight.source.id and (
-                (event["type"] == "cast" and event["ability"] not in ("Speed", "Melee"))
-                or (
-                    event["type"] == "applybuff"
-                    and event["ability"] == "Killing Machine"
-                )
+    def _filter_displayable_events(self, events):
+        """Remove any events we don't care to show in the UI"""
+        for event in events:
+            if event.sourceID == self._fight.source.id and (
+                (event.type == "cast" and event.ability not in ("Speed", "Melee"))
+                or (event.type == "applybuff" and event.ability == "Killing Machine")
                 or (
-                    event["type"] == "removebuff"
-                    and event["ability"] in ("Unbreakable Armor", "Blood Tap")
+                    event.type == "removebuff"
+                    and event.ability in ("Unbreakable Armor", "Blood Tap")
                 )
                 or (
-                    event["type"] == "removedebuff"
-                    and event["ability"] in ("Blood Plague", "Frost Fever")
+                    event.type == "removedebuff"
+                    and event.ability in ("Blood Plague", "Frost Fever")
                     and (
                         self._fight.encounter.name != "Thaddius"
-                        or not event["in_dead_zone"]
+                        or not event.in_dead_zone
                     )
-                    and event["target_is_boss"]
+                    and event.target_is_boss
                 )
                 or (
-                    event["type"] in ("removedebuff", "applydebuff", "refreshdebuff")
-                    and event["ability"]
+                    event.type in ("removedebuff", "applydebuff", "refreshdebuff")
+                    and event.ability
                     in (
                         "Fungal Creep",
                         "Web Spray",
@@ -229,20 +252,18 @@ class Analyzer:
                     )
                 )
             ):
-                events.append(event)
-        return events
+                yield event
 
     def analyze(self):
-        self._preprocess_events()
+        self._events = (
+            Pipeline(self._timings)
+            .stream("preprocess", self._preprocess_events)
+            .stream("detect_initial_rune_state", self._detect_initial_rune_state)
+            .run(self._events)
+        )
 
         runes = self._analysis_config.create_rune_tracker()
-        initial_rune_state = self._get_valid_initial_rune_state()
-        if initial_rune_state:
-            for i, is_death in enumerate(initial_rune_state):
-                runes.runes[i].is_death = is_death
-            has_rune_error = False
-        else:
-            has_rune_error = True
+        runes.set_death_runes(self._initial_rune_state)
 
         table = EventsTable()
 
@@ -258,25 +279,30 @@ class Analyzer:
         )
         analyzers.append(self._analysis_config.get_scorer(analyzers))
 
-        source_id = self._fight.source.id
-        for event in self._events:
-            for analyzer in analyzers:
-                if (
-                    event["sourceID"] == source_id or event["targetID"] == source_id
-                ) or (
-                    analyzer.INCLUDE_PET_EVENTS
-                    and (event["is_owner_pet_source"] or event["is_owner_pet_target"])
-                ):
-                    analyzer.add_event(event)
-
-        displayable_events = self.displayable_events
+        router = EventRouter(analyzers, self._fight.source.id)
+        displayable_events = (
+            Pipeline(self._timings)
+            .stream("decorate", self._decorate_events)
+            .stream("analyze", router.route)
+            .stream("filter_displayable", self._filter_displayable_events)
+            .run(self._events)
+        )
+        for analyzer in analyzers:
+            analyzer.finalize()
+        logging.info(
+            f"Routed {len(self._events)} events, analyzer calls: "
+            f"{router.invocation_counts()}"
+        )
+        logging.info(
+            f"Went over the events in {format_timings(self._fight.timings + self._timings)}"
+        )
 
         if SHOULD_PRINT:
             for event in displayable_events:
                 table.add_event(event)
             table.print()
 
-        analysis = {"has_rune_spend_error": has_rune_error}
+        analysis = {"has_rune_spend_error": runes.rune_spend_error}
 
         for analyzer in analyzers:
             if SHOULD_PRINT:
@@ -293,13 +319,67 @@ class Analyzer:
                 "rankings": self._fight.rankings,
             },
             "analysis": analysis,
-            "events": displayable_events,
-            "spec": self._detect_spec(),
+            "events": [event.to_dict() for event in displayable_events],
+            "spec": self._spec,
             "show_procs": self._analysis_config.show_procs,
             "show_speed": self._analysis_config.show_speed,
         }
 
 
+def _get_imported_paths(path, src_dir):
+    """Paths of the modules under src_dir that the module at path imports"""
+    with open(path, "rb") as f:
+        tree = ast.parse(f.read(), path)
+
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            module_names = [alias.name for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            module_names = [node.module]
+        else:
+            continue
+
+        for module_name in module_names:
+            # Importing a module imports the packages it's in as well
+            parts = module_name.split(".")
+            for i in range(1, len(parts) + 1):
+                module_path = os.path.join(src_dir, *parts[:i])
+                for imported_path in (
+                    module_path + ".py",
+                    os.path.join(module_path, "__init__.py"),
+                ):
+                    if os.path.isfile(imported_path):
+                        yield imported_path
+
+
+def _get_analysis_paths():
+    """
+    Paths of every module of the app the analysis imports, and of the client,
+    which isn't imported here but builds the reports the analysis runs on
+    """
+    src_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    to_visit = [os.path.abspath(__file__), os.path.join(src_dir, "client.py")]
+    paths = set()
+    while to_visit:
+        path = to_visit.pop()
+        if path not in paths:
+            paths.add(path)
+            to_visit.extend(_get_imported_paths(path, src_dir))
+    return sorted(paths)
+
+
+def _get_analysis_version():
+    """Hash of the analysis code, changes whenever a deploy could change the results"""
+    digest = hashlib.sha1()
+    for path in _get_analysis_paths():
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+
+ANALYSIS_VERSION = _get_analysis_version()
+
+
 def analyze(report: Report, fight_id: int):
     fight = report.get_fight(fight_id)
     analyzer = Analyzer(fight)
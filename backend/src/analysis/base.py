@@ -1,18 +1,40 @@
+import bisect
+import sys
+from collections import defaultdict
 from typing import Type, TypeVar
 
 R = TypeVar("R")
 
 
+def name_set(names):
+    """
+    A set of ability or actor names to check events against. Names on events are
+    interned, so interning these too lets lookups match on identity
+    """
+    return frozenset(sys.intern(name) for name in names)
+
+
 def range_overlap(a, b):
     return a[0] <= b[1] and b[0] <= a[1]
 
 
 class BaseAnalyzer:
     INCLUDE_PET_EVENTS = False
+    # Event types and abilities add_event acts on, None for all of them.
+    # Only narrow these when add_event ignores everything else
+    EVENT_TYPES = None
+    ABILITIES = None
 
     def add_event(self, event):
         pass
 
+    def finalize(self):
+        """
+        Called once after the last event, to compute whatever report() and score()
+        return so that they only read it
+        """
+        pass
+
     def print(self):
         pass
 
@@ -23,6 +45,69 @@ class BaseAnalyzer:
         raise NotImplementedError
 
 
+class EventRouter:
+    """
+    Passes each event to the analyzers that subscribed to it, in analyzer order.
+    Which analyzers subscribed to an event type is worked out once per type
+    """
+
+    def __init__(self, analyzers, source_id):
+        self._analyzers = [
+            analyzer
+            for analyzer in analyzers
+            # Analyzers that don't look at events at all
+            if type(analyzer).add_event is not BaseAnalyzer.add_event
+        ]
+        self._source_id = source_id
+        # event type -> (routes for source events, routes for pet events)
+        self._routes = {}
+        self._counts = [0] * len(self._analyzers)
+
+    def _get_routes(self, event_type):
+        routes = []
+        pet_routes = []
+
+        for i, analyzer in enumerate(self._analyzers):
+            if analyzer.EVENT_TYPES is None or event_type in analyzer.EVENT_TYPES:
+                route = (i, analyzer.add_event, analyzer.ABILITIES)
+                routes.append(route)
+                if analyzer.INCLUDE_PET_EVENTS:
+                    pet_routes.append(route)
+
+        self._routes[event_type] = routes, pet_routes
+        return routes, pet_routes
+
+    def add_event(self, event):
+        routes = self._routes.get(event.type)
+        if routes is None:
+            routes = self._get_routes(event.type)
+
+        if event.sourceID == self._source_id or event.targetID == self._source_id:
+            routes = routes[0]
+        elif routes[1] and (event.is_owner_pet_source or event.is_owner_pet_target):
+            routes = routes[1]
+        else:
+            return
+
+        counts = self._counts
+        ability = getattr(event, "ability", None)
+        for i, add_event, abilities in routes:
+            if abilities is None or ability in abilities:
+                counts[i] += 1
+                add_event(event)
+
+    def route(self, events):
+        for event in events:
+            self.add_event(event)
+            yield event
+
+    def invocation_counts(self):
+        counts = defaultdict(int)
+        for analyzer, count in zip(self._analyzers, self._counts):
+            counts[analyzer.__class__.__name__] += count
+        return dict(counts)
+
+
 class BasePreprocessor:
     INCLUDE_PET_EVENTS = False
 
@@ -48,6 +133,7 @@ class ScoreWeight:
 class AnalysisScorer(BaseAnalyzer):
     def __init__(self, analyzers):
         self._analyzers = {analyzer.__class__: analyzer for analyzer in analyzers}
+        self._score = None
 
     def get_analyzer(self, cls: Type[R]) -> R:
         return self._analyzers[cls]
@@ -55,8 +141,12 @@ class AnalysisScorer(BaseAnalyzer):
     def get_score_weights(self):
         return {}
 
+    def finalize(self):
+        # The scorer comes after the analyzers it scores, so they're finalized
+        self._score = self.score_weights_from_dict(self.get_score_weights())
+
     def score(self):
-        return self.score_weights_from_dict(self.get_score_weights())
+        return self._score
 
     def score_weights_from_dict(self, score_weights_dict):
         score_weights = []
@@ -125,14 +215,121 @@ class Window:
         return f"<Window start={self.start} end={self.end}>"
 
 
-def calculate_uptime(windows, ignore_windows, total_duration, max_duration=None):
-    total_uptime = sum(window.duration for window in windows)
+class IntervalSet:
+    """
+    A set of time ranges, stored as the sorted starts and ends of disjoint
+    closed intervals. Overlapping or touching windows are merged into one,
+    so uptimes, which count overlapping windows separately, don't use it
+    """
+
+    def __init__(self, windows=()):
+        self._starts = []
+        self._ends = []
 
+        for window in sorted(windows, key=lambda window: window.start):
+            self._add(window.start, window.end)
+
+    @classmethod
+    def _from_sorted(cls, starts, ends):
+        interval_set = cls()
+        interval_set._starts = starts
+        interval_set._ends = ends
+        return interval_set
+
+    def _add(self, start, end):
+        """Adds an interval starting at or after all of the others"""
+        if self._ends and start <= self._ends[-1]:
+            self._ends[-1] = max(self._ends[-1], end)
+        else:
+            self._starts.append(start)
+            self._ends.append(end)
+
+    @property
+    def duration(self):
+        return sum(end - start for start, end in zip(self._starts, self._ends))
+
+    def contains(self, timestamp):
+        i = bisect.bisect_right(self._starts, timestamp) - 1
+        return i >= 0 and timestamp <= self._ends[i]
+
+    def union(self, other):
+        union = IntervalSet()
+        i = j = 0
+
+        while i < len(self._starts) or j < len(other._starts):
+            if j == len(other._starts) or (
+                i < len(self._starts) and self._starts[i] <= other._starts[j]
+            ):
+                union._add(self._starts[i], self._ends[i])
+                i += 1
+            else:
+                union._add(other._starts[j], other._ends[j])
+                j += 1
+
+        return union
+
+    def clamp(self, start, end):
+        """The intervals overlapping start to end, cut to fit within it"""
+        i = bisect.bisect_left(self._ends, start)
+        j = bisect.bisect_right(self._starts, end)
+        if i >= j:
+            return IntervalSet()
+
+        starts = self._starts[i:j]
+        ends = self._ends[i:j]
+        starts[0] = max(starts[0], start)
+        ends[-1] = min(ends[-1], end)
+        return IntervalSet._from_sorted(starts, ends)
+
+    def __iter__(self):
+        for start, end in zip(self._starts, self._ends):
+            yield Window(start, end)
+
+    def __len__(self):
+        return len(self._starts)
+
+    def __repr__(self):
+        return f"<IntervalSet {list(zip(self._starts, self._ends))}>"
+
+
+def as_interval_set(windows):
+    if isinstance(windows, IntervalSet):
+        return windows
+    return IntervalSet(windows)
+
+
+def overlap_duration(windows, other_windows):
+    """
+    The total duration of the intersections of every window with every other
+    window, so time covered by several windows counts once for each pair.
+    Sweeps over the sorted bounds instead of intersecting every pair
+    """
+    bounds = []
     for window in windows:
-        for ignore_window in ignore_windows:
-            if window.intersects(ignore_window):
-                total_uptime -= window.intersection(ignore_window).duration
+        bounds.append((window.start, 1, 0))
+        bounds.append((window.end, -1, 0))
+    for window in other_windows:
+        bounds.append((window.start, 0, 1))
+        bounds.append((window.end, 0, -1))
+    bounds.sort()
+
+    overlap = 0
+    num_windows = num_other_windows = 0
+    last_timestamp = None
+    for timestamp, window_change, other_window_change in bounds:
+        if num_windows and num_other_windows:
+            overlap += num_windows * num_other_windows * (timestamp - last_timestamp)
+        num_windows += window_change
+        num_other_windows += other_window_change
+        last_timestamp = timestamp
+    return overlap
+
 
+def calculate_uptime(windows, ignore_windows, total_duration, max_duration=None):
+    # Overlapping windows count separately, both in the uptime and in what is ignored
+    total_uptime = sum(window.duration for window in windows) - overlap_duration(
+        windows, ignore_windows
+    )
     total_duration_without_ignores = total_duration - sum(
         window.duration for window in ignore_windows
     )
@@ -145,24 +342,3 @@ def calculate_uptime(windows, ignore_windows, total_duration, max_duration=None)
     if not total_duration_without_ignores:
         return 0
     return total_uptime / total_duration_without_ignores
-
-
-def combine_windows(*windows_list):
-    windows = [window for windows in windows_list for window in windows]
-
-    if not windows:
-        return []
-
-    windows = sorted(windows, key=lambda window: window.start)
-
-    combined_windows = [windows[0]]
-    for window in windows[1:]:
-        if window.start <= combined_windows[-1].end:
-            combined_windows[-1] = Window(
-                min(combined_windows[-1].start, window.start),
-                max(combined_windows[-1].end, window.end),
-            )
-        else:
-            combined_windows.append(window)
-
-    return combined_windows
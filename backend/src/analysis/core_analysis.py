@@ -1,3 +1,5 @@
+import bisect
+import math
 from collections import defaultdict
 from typing import Optional
 
@@ -7,6 +9,7 @@ from analysis.base import (
     BasePreprocessor,
     Window,
     calculate_uptime,
+    name_set,
     range_overlap,
 )
 from analysis.items import Trinket, ItemPreprocessor
@@ -15,14 +18,16 @@ from report import Fight
 
 
 class DeadZoneAnalyzer(BasePreprocessor):
-    MELEE_ABILITIES = {
-        "Melee",
-        "Obliterate",
-        "Frost Strike",
-        "Blood Strike",
-        "Plague Strike",
-        "Pestilence",
-    }
+    MELEE_ABILITIES = name_set(
+        {
+            "Melee",
+            "Obliterate",
+            "Frost Strike",
+            "Blood Strike",
+            "Plague Strike",
+            "Pestilence",
+        }
+    )
 
     class DeadZone(Window):
         def __init__(self, last_timestamp, curr_timestamp):
@@ -50,15 +55,17 @@ class DeadZoneAnalyzer(BasePreprocessor):
         }.get(self._fight.encounter.name)
         self._encounter_name = self._fight.encounter.name
         self._is_hard_mode = self._fight.is_hard_mode
+        # Built from the dead zones once they're all known
+        self._dead_zone_starts = None
 
     def _check_boss_events_occur(self, event):
-        if event.get("source_is_boss") or (
-            event.get("target_is_boss") and event["type"] == "cast"
+        if getattr(event, "source_is_boss", None) or (
+            getattr(event, "target_is_boss", None) and event.type == "cast"
         ):
-            if event["timestamp"] - self._last_timestamp > 7000:
-                dead_zone = self.DeadZone(self._last_timestamp, event["timestamp"])
+            if event.timestamp - self._last_timestamp > 7000:
+                dead_zone = self.DeadZone(self._last_timestamp, event.timestamp)
                 self._dead_zones.append(dead_zone)
-            self._last_timestamp = event["timestamp"]
+            self._last_timestamp = event.timestamp
 
     def _check_vezax(self, event):
         if not self._is_hard_mode:
@@ -66,125 +73,119 @@ class DeadZoneAnalyzer(BasePreprocessor):
 
         if (
             not self._last_event
-            and event["type"] == "damage"
-            and event["target"] == "General Vezax"
-            and "hitPoints" in event
-            and event["hitPoints"] / event["maxHitPoints"] <= 0.05
+            and event.type == "damage"
+            and event.target == "General Vezax"
+            and hasattr(event, "hitPoints")
+            and event.hitPoints / event.maxHitPoints <= 0.05
         ):
             self._last_event = event
         if (
             (
-                event.get("source") == "Saronite Animus"
-                or event.get("target") == "Saronite Animus"
+                getattr(event, "source", None) == "Saronite Animus"
+                or getattr(event, "target", None) == "Saronite Animus"
             )
             and self._last_event
             and not self._dead_zones
         ):
-            dead_zone = self.DeadZone(self._last_event["timestamp"], event["timestamp"])
+            dead_zone = self.DeadZone(self._last_event.timestamp, event.timestamp)
             self._dead_zones.append(dead_zone)
 
     def _check_algalon(self, event):
-        if event["type"] not in ("applydebuff", "removedebuff"):
+        if event.type not in ("applydebuff", "removedebuff"):
             return
 
-        if event["ability"] != "Black Hole":
+        if event.ability != "Black Hole":
             return
 
-        if event["type"] == "applydebuff":
+        if event.type == "applydebuff":
             self._last_event = event
-        elif event["type"] == "removedebuff":
-            dead_zone = self.DeadZone(self._last_event["timestamp"], event["timestamp"])
+        elif event.type == "removedebuff":
+            dead_zone = self.DeadZone(self._last_event.timestamp, event.timestamp)
             self._dead_zones.append(dead_zone)
 
     def _check_ignis(self, event):
-        if event["type"] not in ("removedebuff", "applydebuff"):
+        if event.type not in ("removedebuff", "applydebuff"):
             return
 
-        if event["ability"] != "Slag Pot":
+        if event.ability != "Slag Pot":
             return
 
-        if event["type"] == "applydebuff":
+        if event.type == "applydebuff":
             self._last_event = event
-        elif event["type"] == "removedebuff":
-            dead_zone = self.DeadZone(self._last_event["timestamp"], event["timestamp"])
+        elif event.type == "removedebuff":
+            dead_zone = self.DeadZone(self._last_event.timestamp, event.timestamp)
             self._dead_zones.append(dead_zone)
 
     def _check_kelthuzad(self, event):
-        if event["type"] not in ("removedebuff", "applydebuff"):
+        if event.type not in ("removedebuff", "applydebuff"):
             return
 
-        if event["ability"] != "Frost Blast":
+        if event.ability != "Frost Blast":
             return
 
-        if event["type"] == "applydebuff":
+        if event.type == "applydebuff":
             self._last_event = event
-        elif event["type"] == "removedebuff":
-            dead_zone = self.DeadZone(self._last_event["timestamp"], event["timestamp"])
+        elif event.type == "removedebuff":
+            dead_zone = self.DeadZone(self._last_event.timestamp, event.timestamp)
             self._dead_zones.append(dead_zone)
 
     def _check_maexxna(self, event):
-        if event["type"] not in ("removedebuff", "applydebuff"):
+        if event.type not in ("removedebuff", "applydebuff"):
             return
 
-        if event["ability"] != "Web Spray":
+        if event.ability != "Web Spray":
             return
 
-        if event["type"] == "applydebuff":
+        if event.type == "applydebuff":
             self._last_event = event
-        elif event["type"] == "removedebuff":
-            dead_zone = self.DeadZone(self._last_event["timestamp"], event["timestamp"])
+        elif event.type == "removedebuff":
+            dead_zone = self.DeadZone(self._last_event.timestamp, event.timestamp)
             self._dead_zones.append(dead_zone)
 
     def _check_thaddius(self, event):
-        if event["type"] not in ("cast", "damage"):
+        if event.type not in ("cast", "damage"):
             return
 
-        if event.get("target") not in ("Thaddius", "Stalagg", "Feugen"):
+        if getattr(event, "target", None) not in ("Thaddius", "Stalagg", "Feugen"):
             return
 
-        if event["source"] != self._fight.source.name:
+        if event.source != self._fight.source.name:
             return
 
-        if self._last_event and self._last_event["target"] != event["target"]:
-            dead_zone = self.DeadZone(self._last_event["timestamp"], event["timestamp"])
+        if self._last_event and self._last_event.target != event.target:
+            dead_zone = self.DeadZone(self._last_event.timestamp, event.timestamp)
             self._dead_zones.append(dead_zone)
 
         self._last_event = event
 
     def _check_razorscale(self, event):
-        if event.get("target") != "Razorscale":
+        if getattr(event, "target", None) != "Razorscale":
             return
 
-        if event["type"] != "cast":
+        if event.type != "cast":
             return
 
-        if event["source"] != self._fight.source.name:
+        if event.source != self._fight.source.name:
             return
 
-        if (
-            self._last_event
-            and event["timestamp"] - self._last_event["timestamp"] > 20000
-        ):
-            dead_zone = self.DeadZone(self._last_event["timestamp"], event["timestamp"])
+        if self._last_event and event.timestamp - self._last_event.timestamp > 20000:
+            dead_zone = self.DeadZone(self._last_event.timestamp, event.timestamp)
             self._dead_zones.append(dead_zone)
 
         self._last_event = event
 
     def _check_loatheb(self, event):
-        if event.get("target") != "Loatheb":
+        if getattr(event, "target", None) != "Loatheb":
             return
 
-        if event["type"] != "cast" or event["ability"] not in self.MELEE_ABILITIES:
+        if event.type != "cast" or event.ability not in self.MELEE_ABILITIES:
             return
 
-        if event["source"] != self._fight.source.name:
+        if event.source != self._fight.source.name:
             return
 
-        if (
-            self._last_event
-            and event["timestamp"] - self._last_event["timestamp"] > 2000
-        ):
-            dead_zone = self.DeadZone(self._last_event["timestamp"], event["timestamp"])
+        if self._last_event and event.timestamp - self._last_event.timestamp > 2000:
+            dead_zone = self.DeadZone(self._last_event.timestamp, event.timestamp)
             self._dead_zones.append(dead_zone)
 
         self._last_event = event
@@ -193,9 +194,24 @@ class DeadZoneAnalyzer(BasePreprocessor):
         if not self._checker:
             return
 
+        self._dead_zone_starts = None
         return self._checker(event)
 
+    def _get_dead_zone_starts(self):
+        """Starts of the dead zones to bisect, None if they're somehow out of order"""
+        if self._dead_zone_starts is None:
+            starts = [dead_zone.start for dead_zone in self._dead_zones]
+            is_sorted = all(starts[i] <= starts[i + 1] for i in range(len(starts) - 1))
+            self._dead_zone_starts = starts if is_sorted else False
+        return self._dead_zone_starts if self._dead_zone_starts is not False else None
+
     def get_recent_dead_zone(self, end) -> Optional[DeadZone]:
+        starts = self._get_dead_zone_starts()
+        if starts is not None:
+            # returns the closest dead-zone
+            i = bisect.bisect_right(starts, end)
+            return self._dead_zones[i - 1] if i else None
+
         for dead_zone in reversed(self._dead_zones):
             # returns the closest dead-zone
             if dead_zone.start <= end:
@@ -206,269 +222,310 @@ class DeadZoneAnalyzer(BasePreprocessor):
         return [Window(window.start, window.end) for window in self._dead_zones]
 
     def decorate_event(self, event):
-        dead_zone = self.get_recent_dead_zone(event["timestamp"])
-        event["in_dead_zone"] = dead_zone and event["timestamp"] in dead_zone
-        event["recent_dead_zone"] = dead_zone and (dead_zone.start, dead_zone.end)
+        dead_zone = self.get_recent_dead_zone(event.timestamp)
+        event.in_dead_zone = dead_zone and event.timestamp in dead_zone
+        event.recent_dead_zone = dead_zone and (dead_zone.start, dead_zone.end)
+
 
+class Runes:
+    """
+    State of the six runes, as arrays indexed by rune:
+    Blood1, Blood2, Frost1, Frost2, Unholy1, Unholy2
+    """
 
-class Rune:
     RUNE_GRACE = 2471
+    RUNE_COOLDOWN = 10000
+    TYPES = ("Blood", "Blood", "Frost", "Frost", "Unholy", "Unholy")
+    # Only blood runes can be converted to death runes
+    BLOOD = (0, 1)
+    # (rune cost key, rune type, indices of its runes)
+    SLOTS = (
+        ("blood", "Blood", (0, 1)),
+        ("frost", "Frost", (2, 3)),
+        ("unholy", "Unholy", (4, 5)),
+    )
+
+    __slots__ = ("regen_time", "is_death", "blood_tapped")
 
-    def __init__(self, full_name, type):
-        self.full_name = full_name
-        self.type = type
-        self.regen_time = None
+    def __init__(self):
+        # None until the rune is first spent
+        self.regen_time = [None] * 6
         # Flag for death rune (when converted normally)
-        self.is_death = False
-        # Blood Tap is tracked as separate attribute since a blood-tapped
+        self.is_death = [False] * 6
+        # Blood Tap is tracked as separate flag since a blood-tapped
         # death rune doesn't convert back to blood when used
         # like a normal death rune does
-        self.blood_tapped = False
+        self.blood_tapped = [False] * 6
 
-    def can_spend(self, timestamp: int):
-        if self.regen_time is None:
-            return True
-        return timestamp >= self.regen_time
-
-    def can_spend_death(self, timestamp: int):
-        return (self.is_death or self.blood_tapped) and self.can_spend(timestamp)
-
-    def _rune_grace_used(self, timestamp):
-        return min(self.RUNE_GRACE, self.time_since_regen(timestamp))
+    def can_spend(self, i, timestamp: int):
+        regen_time = self.regen_time[i]
+        return regen_time is None or timestamp >= regen_time
 
-    def refresh(self, timestamp):
-        self.regen_time = timestamp
+    def can_spend_death(self, i, timestamp: int):
+        return (self.is_death[i] or self.blood_tapped[i]) and self.can_spend(
+            i, timestamp
+        )
 
-    def spend(self, timestamp: int, convert: bool):
-        if not self.can_spend(timestamp):
-            return False, 0
+    def spend(self, i, timestamp: int):
+        """Puts a spendable rune on cooldown, returns the rune grace wasted"""
+        regen_time = self.regen_time[i]
+        time_since_regen = 0 if regen_time is None else max(0, timestamp - regen_time)
+        rune_grace_used = min(self.RUNE_GRACE, time_since_regen)
+        self.regen_time[i] = timestamp + (self.RUNE_COOLDOWN - rune_grace_used)
+        return max(0, time_since_regen - self.RUNE_GRACE)
 
-        rune_grace_used = self._rune_grace_used(timestamp)
-        rune_grace_wasted = max(0, self.time_since_regen(timestamp) - self.RUNE_GRACE)
-        self.regen_time = timestamp + (10000 - rune_grace_used)
+    def get_name(self, i):
+        if self.is_death[i] or self.blood_tapped[i]:
+            return "Death"
+        return self.TYPES[i]
 
-        if convert and not self.blood_tapped:
-            self.convert_to_death()
-        return True, rune_grace_wasted
+    def num_available(self, indices, timestamp: int):
+        return sum(1 for i in indices if self.can_spend(i, timestamp))
 
-    def convert_to_death(self):
-        assert not self.blood_tapped
-        self.is_death = True
+    def sorted_by_regen(self, indices):
+        return sorted(indices, key=lambda i: (self.regen_time[i] or 0, i))
 
-    def blood_tap(self):
-        assert not self.is_death
-        self.blood_tapped = True
 
-    def stop_blood_tap(self):
-        self.blood_tapped = False
+class RuneSnapshot:
+    """
+    Immutable state of the runes at a point in time, shared by all the events
+    it holds for. Holds (name, is_available, regen_time) for each rune, and only
+    becomes the list of rune dicts when serialized
+    """
 
-    def spend_death(self, timestamp: int, convert_back: bool):
-        if not self.can_spend_death(timestamp):
-            return False, 0
+    __slots__ = ("runes", "_timestamp", "_expires_at")
 
-        spend, rune_grace_wasted = self.spend(timestamp, False)
-        if not spend:
-            return spend, rune_grace_wasted
+    def __init__(self, runes: Runes, timestamp):
+        self.runes = tuple(
+            (runes.get_name(i), runes.can_spend(i, timestamp), runes.regen_time[i])
+            for i in range(6)
+        )
+        self._timestamp = timestamp
+        # Runes becoming available changes the snapshot without the runes changing
+        self._expires_at = min(
+            (
+                regen_time
+                for _, is_available, regen_time in self.runes
+                if not is_available
+            ),
+            default=math.inf,
+        )
 
-        if convert_back and not self.blood_tapped:
-            self.is_death = False
-        return spend, rune_grace_wasted
+    def holds_at(self, timestamp):
+        return self._timestamp <= timestamp < self._expires_at
 
-    def get_name(self):
-        if self.is_death or self.blood_tapped:
-            return "Death"
-        return self.type
+    def serialize(self):
+        return [
+            {"name": name, "is_available": is_available, "regen_time": regen_time}
+            for name, is_available, regen_time in self.runes
+        ]
 
-    def time_since_regen(self, timestamp):
-        if self.regen_time is None:
-            return 0
-        return max(0, timestamp - self.regen_time)
+    def __repr__(self):
+        return f"RuneSnapshot({self.runes})"
 
 
 class RuneTracker(BaseAnalyzer):
     def __init__(self, should_convert_blood, track_drift_type):
-        self.runes = [
-            Rune("Blood1", "Blood"),
-            Rune("Blood2", "Blood"),
-            Rune("Frost1", "Frost"),
-            Rune("Frost2", "Frost"),
-            Rune("Unholy1", "Unholy"),
-            Rune("Unholy2", "Unholy"),
-        ]
+        self.runes = Runes()
         self.rune_grace_wasted = 0
         self.rune_spend_error = False
         self._should_convert_blood = should_convert_blood
         self._track_drift_type = track_drift_type
+        # Cleared whenever the runes change, see _snapshot
+        self._rune_snapshot = None
 
-    @property
-    def current_death_runes(self):
-        return [r for r in self.runes if r.is_death or r.blood_tapped]
-
-    def _sorted_runes(self, runes):
-        runes_ = [(rune, i) for i, rune in enumerate(runes)]
-        runes_sorted = sorted(runes_, key=lambda r: (r[0].regen_time or 0, r[1]))
-        return [rune for rune, _ in runes_sorted]
+    def set_death_runes(self, is_death):
+        """Sets which runes start as death runes, from Blood1 onwards"""
+        self._rune_snapshot = None
+        for i, is_death_ in enumerate(is_death):
+            self.runes.is_death[i] = is_death_
 
     def resync_runes(self, timestamp, rune_cost, runes_used):
-        def _resync_runes(runes, num):
-            refreshed = 0
-
-            for rune in self._sorted_runes(runes):
-                if refreshed >= num:
-                    break
-                if not rune.can_spend(timestamp):
-                    rune.refresh(timestamp)
-                refreshed += 1
-
-            return refreshed == num
-
-        total_cost = rune_cost["blood"] + rune_cost["frost"] + rune_cost["unholy"]
-        total_used = runes_used["blood"] + runes_used["frost"] + runes_used["unholy"]
-
-        _resync_runes(self.runes[0:2], runes_used["blood"])
-        _resync_runes(self.runes[2:4], runes_used["frost"])
-        _resync_runes(self.runes[4:6], runes_used["unholy"])
-        _resync_runes(self.current_death_runes, total_cost - total_used)
+        self._rune_snapshot = None
+        runes = self.runes
+
+        def _resync_runes(indices, num):
+            if num <= 0:
+                return
+            for i in runes.sorted_by_regen(indices)[:num]:
+                if not runes.can_spend(i, timestamp):
+                    runes.regen_time[i] = timestamp
+
+        num_death = 0
+        for cost_key, _, indices in Runes.SLOTS:
+            _resync_runes(indices, runes_used[cost_key])
+            num_death += rune_cost[cost_key] - runes_used[cost_key]
+
+        _resync_runes(
+            [i for i in range(6) if runes.is_death[i] or runes.blood_tapped[i]],
+            num_death,
+        )
 
-    def _spend_runes(self, num, runes, timestamp, convert=False):
+    def _spend_runes(self, num, indices, timestamp, convert=False):
         if not num:
             return True, 0
 
+        runes = self.runes
         spent = 0
         rune_grace_wasted = 0
 
-        for rune in runes:
+        for i in indices:
             if spent == num:
                 break
             # Don't spend deaths here in order to prioritize normal runes,
             # deaths will be done in next loop
-            if rune.can_spend(timestamp) and not rune.can_spend_death(timestamp):
-                rune_grace_wasted += rune.spend(timestamp, convert)[1]
+            if not (runes.is_death[i] or runes.blood_tapped[i]) and runes.can_spend(
+                i, timestamp
+            ):
+                rune_grace_wasted += runes.spend(i, timestamp)
+                if convert:
+                    runes.is_death[i] = True
                 spent += 1
 
-        for rune in self.runes[:2]:
+        for i in Runes.BLOOD:
             if spent == num:
                 break
-            if rune.can_spend_death(timestamp):
+            if runes.can_spend_death(i, timestamp):
                 # Ignore death rune_grace_wasted
-                rune.spend_death(timestamp, convert_back=not convert)
+                runes.spend(i, timestamp)
+                if not convert and not runes.blood_tapped[i]:
+                    runes.is_death[i] = False
                 spent += 1
 
                 # This handles the case where we use a death rune for a spell
                 # that would convert some runes to death.
                 # The in-game behaviour is that if a death is used instead,
                 # then it finds a rune that could have been converted and does so
-                if convert and rune.blood_tapped:
+                if convert and runes.blood_tapped[i]:
                     # A rune should never be both blood tapped and a
                     # normally converted death rune
-                    assert not rune.is_death
+                    assert not runes.is_death[i]
 
                     # Find the first non-blood-tapped rune and convert it
-                    for rune_ in runes:
-                        if not rune_.is_death and not rune_.blood_tapped:
-                            rune_.convert_to_death()
+                    for j in indices:
+                        if not runes.is_death[j] and not runes.blood_tapped[j]:
+                            runes.is_death[j] = True
                             break
 
         return spent == num, rune_grace_wasted
 
     def spend(self, ability, timestamp: int, blood: int, frost: int, unholy: int):
+        self._rune_snapshot = None
         convert_blood = self._should_convert_blood and ability in (
             "Blood Strike",
             "Pestilence",
         )
-        blood_spend = self._spend_runes(
-            blood, self.runes[0:2], timestamp, convert_blood
-        )
-        frost_spend = self._spend_runes(frost, self.runes[2:4], timestamp)
-        unholy_spend = self._spend_runes(unholy, self.runes[4:6], timestamp)
-
-        spent = blood_spend[0] and frost_spend[0] and unholy_spend[0]
-        drifts = [
-            v
-            for k, v in zip(
-                ("Blood", "Frost", "Unholy"),
-                (blood_spend[1], frost_spend[1], unholy_spend[1]),
+
+        spent = True
+        rune_grace_wasted = 0
+        for (cost_key, rune_type, indices), num in zip(
+            Runes.SLOTS, (blood, frost, unholy)
+        ):
+            spent_, rune_grace_wasted_ = self._spend_runes(
+                num, indices, timestamp, convert_blood and cost_key == "blood"
             )
-            if k in self._track_drift_type
-        ]
-        rune_grace_wasted = max(drifts, default=0)
+            spent = spent and spent_
+            if rune_type in self._track_drift_type:
+                rune_grace_wasted = max(rune_grace_wasted, rune_grace_wasted_)
         return spent, rune_grace_wasted
 
     def blood_tap(self, timestamp: int):
+        self._rune_snapshot = None
+        runes = self.runes
+
         # Convert one of the runes to a death rune
-        for i in range(2):
-            if not self.runes[i].is_death:
-                self.runes[i].blood_tap()
+        for i in Runes.BLOOD:
+            if not runes.is_death[i]:
+                runes.blood_tapped[i] = True
                 break
 
         # Refresh the cooldown of one of the runes
-        for i in range(2):
-            if not self.runes[i].can_spend(timestamp):
-                self.runes[i].refresh(timestamp)
+        for i in Runes.BLOOD:
+            if not runes.can_spend(i, timestamp):
+                runes.regen_time[i] = timestamp
                 break
 
     def stop_blood_tap(self):
-        for i in range(2):
-            if self.runes[i].blood_tapped:
-                self.runes[i].stop_blood_tap()
+        self._rune_snapshot = None
+        for i in Runes.BLOOD:
+            if self.runes.blood_tapped[i]:
+                self.runes.blood_tapped[i] = False
                 break
 
     def erw(self, timestamp: int):
+        self._rune_snapshot = None
         for i in range(6):
-            if not self.runes[i].can_spend(timestamp):
-                self.runes[i].refresh(timestamp)
+            if not self.runes.can_spend(i, timestamp):
+                self.runes.regen_time[i] = timestamp
 
     def current_runes(self, timestamp):
-        def _count_rune(i):
-            return 1 if self.runes[i].can_spend(timestamp) else 0
-
         return {
-            "blood": sum(_count_rune(i) for i in range(0, 2)),
-            "frost": sum(_count_rune(i) for i in range(2, 4)),
-            "unholy": sum(_count_rune(i) for i in range(4, 6)),
+            cost_key: self.runes.num_available(indices, timestamp)
+            for cost_key, _, indices in Runes.SLOTS
         }
 
-    def add_event(self, event):
-        if event.get("rune_cost"):
+    def _sync(self, event):
+        if getattr(event, "rune_cost", None):
             # Bit of a hack to deal with the logs saying there's no rune
             # but there actually is. So we only respawn a new rune if we actually need it
             # http://localhost:5173/?fight=56&source=19&report=4ZtgQYvTyAmbMLDX
-            runes_needed = {}
-            for rune_type, num in self.current_runes(event["timestamp"]).items():
-                runes_used = event["runes_used"]
-                runes_needed[rune_type] = max(num, runes_used[rune_type])
+            runes_used = event.runes_used
+            runes_needed = {
+                rune_type: max(num, runes_used[rune_type])
+                for rune_type, num in self.current_runes(event.timestamp).items()
+            }
 
             # Sync runes to what we think they should be
-            self.resync_runes(event["timestamp"], event["rune_cost"], runes_needed)
+            self.resync_runes(event.timestamp, event.rune_cost, runes_needed)
+
+    def _update(self, event):
+        """Applies the event to the runes, returns (spent, rune_grace_wasted) if it cost any"""
+        rune_spend = None
+
+        if event.type == "cast":
+            if event.rune_cost:
+                rune_spend = self.spend(
+                    event.ability,
+                    event.timestamp,
+                    **event.rune_cost,
+                )
 
-        event["runes_before"] = self._serialize(event["timestamp"])
+            if event.ability == "Blood Tap":
+                self.blood_tap(event.timestamp)
 
-        if event["type"] == "cast":
-            if event.get("rune_cost"):
-                spent, rune_grace_wasted = self.spend(
-                    event["ability"],
-                    event["timestamp"],
-                    **event["rune_cost"],
-                )
-                event["rune_spend_error"] = not spent
+            if event.ability == "Empower Rune Weapon":
+                self.erw(event.timestamp)
 
-                if not event["in_dead_zone"] and (
-                    not event["recent_dead_zone"]
-                    or event["timestamp"] - event["recent_dead_zone"][1] > 7500
-                ):
-                    event["rune_grace_wasted"] = rune_grace_wasted
-                    self.rune_grace_wasted += rune_grace_wasted
+        if event.type == "removebuff" and event.ability == "Blood Tap":
+            self.stop_blood_tap()
 
-            if event["ability"] == "Blood Tap":
-                self.blood_tap(event["timestamp"])
+        return rune_spend
 
-            if event["ability"] == "Empower Rune Weapon":
-                self.erw(event["timestamp"])
+    def simulate(self, event):
+        """Tracks the runes through the event without annotating it, returns False on a spend error"""
+        self._sync(event)
+        rune_spend = self._update(event)
+        return rune_spend is None or rune_spend[0]
 
-        if event["type"] == "removebuff" and event["ability"] == "Blood Tap":
-            self.stop_blood_tap()
+    def add_event(self, event):
+        self._sync(event)
+        event.runes_before = self._snapshot(event.timestamp)
+
+        rune_spend = self._update(event)
+        if rune_spend is not None:
+            spent, rune_grace_wasted = rune_spend
+            event.rune_spend_error = not spent
+            if not spent:
+                self.rune_spend_error = True
+
+            if not event.in_dead_zone and (
+                not event.recent_dead_zone
+                or event.timestamp - event.recent_dead_zone[1] > 7500
+            ):
+                event.rune_grace_wasted = rune_grace_wasted
+                self.rune_grace_wasted += rune_grace_wasted
 
-        event["runes"] = self._serialize(event["timestamp"])
+        event.runes = self._snapshot(event.timestamp)
 
     def print(self):
         console.print(f"* You drifted runes by a total of {self.rune_grace_wasted} ms")
@@ -476,15 +533,11 @@ class RuneTracker(BaseAnalyzer):
     def score(self):
         return max(0.0, 1 - self.rune_grace_wasted * 0.000025)
 
-    def _serialize(self, timestamp):
-        return [
-            {
-                "name": rune.get_name(),
-                "is_available": rune.can_spend(timestamp),
-                "regen_time": rune.regen_time,
-            }
-            for rune in self.runes
-        ]
+    def _snapshot(self, timestamp):
+        """The RuneSnapshot at the timestamp, reused until the runes change"""
+        if self._rune_snapshot is None or not self._rune_snapshot.holds_at(timestamp):
+            self._rune_snapshot = RuneSnapshot(self.runes, timestamp)
+        return self._rune_snapshot
 
     def report(self):
         return {
@@ -500,6 +553,8 @@ class BuffWindows:
         self.buff_id = buff_id
         self.icon = icon
         self._windows = []
+        # Sorted (starts, ends) of the windows to bisect, built on first lookup
+        self._bounds = None
 
     @property
     def has_window(self):
@@ -524,30 +579,124 @@ class BuffWindows:
         return len(self._windows)
 
     def pop(self):
+        self._bounds = None
         return self._windows.pop()
 
     def add_window(self, start, end=None):
+        self._bounds = None
         self._windows.append(Window(start, end))
 
+    def end_active_window(self, end):
+        self._bounds = None
+        self._windows[-1].end = end
+
+    def close_active_window(self, end):
+        self._bounds = None
+        self._windows[-1] = Window(self._windows[-1].start, end)
+
+    def _get_bounds(self):
+        """
+        The starts and ends of the windows, None if they aren't both in order.
+        They should be, but if not the windows are scanned instead
+        """
+        if self._bounds is None:
+            starts = [window.start for window in self._windows]
+            ends = [
+                math.inf if window.end is None else window.end
+                for window in self._windows
+            ]
+            is_sorted = all(
+                starts[i] <= starts[i + 1] and ends[i] <= ends[i + 1]
+                for i in range(len(starts) - 1)
+            )
+            self._bounds = (starts, ends) if is_sorted else False
+        return self._bounds if self._bounds is not False else None
+
     def contains(self, timestamp):
-        for window in self._windows:
-            if window.contains(timestamp):
-                return True
-        return False
+        return self.containing_window(timestamp) is not None
 
     def containing_window(self, timestamp):
+        bounds = self._get_bounds()
+        if bounds is not None:
+            starts, ends = bounds
+            # The first window that hasn't ended yet, if it has started
+            i = bisect.bisect_left(ends, timestamp)
+            if i < len(starts) and starts[i] <= timestamp:
+                return self._windows[i]
+            return None
+
         for window in self._windows:
             if window.contains(timestamp):
                 return window
         return None
 
 
+class ActiveBuffIndex:
+    """
+    The buffs active throughout the fight, as the points at which they change.
+    Between two change points the same (shared, immutable) tuple of buffs is
+    returned, and lookups going forward in time continue from the previous one
+    """
+
+    def __init__(self, buff_windows_list):
+        # Windows start at (start, 0) and end after (end, 1), so that looking up
+        # (timestamp, 0) includes the windows starting or ending at timestamp
+        changes = defaultdict(list)
+        for buff_windows in buff_windows_list:
+            for i, window in enumerate(buff_windows.windows):
+                buff = {
+                    "ability": buff_windows.buff_name,
+                    "ability_icon": buff_windows.icon,
+                    "abilityGameID": buff_windows.buff_id,
+                    "start": window.start,
+                }
+                changes[(window.start, 0)].append((buff_windows, i, buff))
+                if window.end is not None:
+                    changes[(window.end, 1)].append((buff_windows, i, None))
+
+        # buff name -> {window index: buff} of the windows containing the point
+        active = defaultdict(dict)
+        self._points = sorted(changes)
+        self._buffs = [()]
+
+        for point in self._points:
+            for buff_windows, i, buff in changes[point]:
+                if buff is None:
+                    active[buff_windows.buff_name].pop(i, None)
+                else:
+                    active[buff_windows.buff_name][i] = buff
+
+            buffs = []
+            for buff_windows in buff_windows_list:
+                windows = active[buff_windows.buff_name]
+                # Like containing_window, the first window if they overlap
+                if windows:
+                    buffs.append(windows[min(windows)])
+            buffs.sort(key=lambda x: ("Presence" not in x["ability"], x["start"]))
+            self._buffs.append(tuple(buffs))
+
+        self._i = 0
+
+    def get(self, timestamp):
+        point = (timestamp, 0)
+        points = self._points
+        i = self._i
+
+        if i and point < points[i - 1]:
+            i = self._i = bisect.bisect_right(points, point, 0, i)
+        elif i < len(points) and point >= points[i]:
+            i = self._i = bisect.bisect_right(points, point, i)
+
+        return self._buffs[i]
+
+
 class BuffTracker(BaseAnalyzer, BasePreprocessor):
     def __init__(self, buffs_to_track, end_time, starting_auras, spec):
-        self._buffs_to_track = buffs_to_track
+        self._buffs_to_track = name_set(buffs_to_track)
         self._spec = spec
         self._end_time = end_time
         self._buff_windows = {}
+        self._active_buff_index = None
         self._add_starting_auras(starting_auras)
         self._presences = {"Blood Presence", "Frost Presence", "Unholy Presence"}
 
@@ -566,10 +715,11 @@ class BuffTracker(BaseAnalyzer, BasePreprocessor):
         if buff_name not in self._buff_windows:
             return []
 
-        windows = self._buff_windows[buff_name].windows
-        if windows and windows[-1].end is None:
-            windows[-1] = Window(windows[-1].start, self._end_time)
-        return windows
+        buff_windows = self._buff_windows[buff_name]
+        if buff_windows.has_active_window:
+            buff_windows.close_active_window(self._end_time)
+            self._active_buff_index = None
+        return buff_windows.windows
 
     @property
     def has_flask(self):
@@ -588,7 +738,7 @@ class BuffTracker(BaseAnalyzer, BasePreprocessor):
         return bool(self._num_windows("Blood Fury"))
 
     def preprocess_event(self, event):
-        if event["type"] not in (
+        if event.type not in (
             "applybuff",
             "removebuff",
             "removebuffstack",
@@ -597,36 +747,37 @@ class BuffTracker(BaseAnalyzer, BasePreprocessor):
         ):
             return
 
+        self._active_buff_index = None
         windows = self._get_buff_windows(
-            event["ability"],
-            event["abilityGameID"],
-            event["ability_icon"],
+            event.ability,
+            event.abilityGameID,
+            event.ability_icon,
         )
 
-        if event["type"] in ("removebuffstack", "refreshbuff", "heal"):
+        if event.type in ("removebuffstack", "refreshbuff", "heal"):
             # If we don't have a window, assume it was a starting aura
             if not windows.has_window:
                 # resolve the issue where combatant info lags behind the first event
                 # ie. on beasts when army is snapshotted with UP
-                if event["ability"] in self._presences:
+                if event.ability in self._presences:
                     for presence in self._presences:
                         presence_windows = self._buff_windows.get(presence)
                         if presence_windows and presence_windows.has_active_window:
                             presence_windows.pop()
                 windows.add_window(0)
-        elif event["type"] == "applybuff":
-            if event["ability"] in ("Speed", "Indestructible"):
-                if self.is_active("Speed", event["timestamp"]):
+        elif event.type == "applybuff":
+            if event.ability in ("Speed", "Indestructible"):
+                if self.is_active("Speed", event.timestamp):
                     self._buff_windows["Speed"].pop()
-                elif self.is_active("Indestructible", event["timestamp"]):
+                elif self.is_active("Indestructible", event.timestamp):
                     self._buff_windows["Indestructible"].pop()
 
             if not windows.has_active_window:
-                windows.add_window(event["timestamp"])
-        elif event["type"] == "removebuff":
-            end = event["timestamp"]
+                windows.add_window(event.timestamp)
+        elif event.type == "removebuff":
+            end = event.timestamp
             if windows.has_active_window:
-                windows.active_window.end = end
+                windows.end_active_window(end)
             elif not windows.has_window:  # assume it was a starting aura
                 windows.add_window(0, end)
 
@@ -668,30 +819,27 @@ class BuffTracker(BaseAnalyzer, BasePreprocessor):
         return self._buff_windows[buff].contains(timestamp)
 
     def get_active_buffs(self, timestamp):
-        windows = []
-
-        for buff, buff_windows in self._buff_windows.items():
-            if buff in self._buffs_to_track:
-                containing_window = buff_windows.containing_window(timestamp)
-
-                if containing_window:
-                    windows.append(
-                        {
-                            "ability": buff,
-                            "ability_icon": buff_windows.icon,
-                            "abilityGameID": buff_windows.buff_id,
-                            "start": containing_window.start,
-                        }
-                    )
-        return sorted(windows, key=lambda x: ("Presence" not in x["ability"], x["start"]))
+        """The tracked buffs active at timestamp, shared between calls so not to be modified"""
+        if self._active_buff_index is None:
+            self._active_buff_index = ActiveBuffIndex(
+                [
+                    buff_windows
+                    for buff, buff_windows in self._buff_windows.items()
+                    if buff in self._buffs_to_track
+                ]
+            )
+        return self._active_buff_index.get(timestamp)
 
     def decorate_event(self, event):
-        event["buffs"] = self.get_active_buffs(event["timestamp"])
+        buffs = self.get_active_buffs(event.timestamp)
 
-        if event.get("ability") in self._presences:
+        if getattr(event, "ability", None) in self._presences:
             # only keep the first presence
-            presences = [buff for buff in event["buffs"] if "Presence" in buff["ability"]][1:]
-            event["buffs"] = [buff for buff in event["buffs"] if buff not in presences]
+            presences = [buff for buff in buffs if "Presence" in buff["ability"]][1:]
+            buffs = tuple(buff for buff in buffs if buff not in presences)
+
+        event.buffs = buffs
+
 
 class PetNameDetector(BasePreprocessor):
     INCLUDE_PET_EVENTS = True
@@ -700,23 +848,27 @@ class PetNameDetector(BasePreprocessor):
         self._pet_names = {}
 
     def preprocess_event(self, event):
-        if event["source"] in ("Army of the Dead", "Ghoul", "Ebon Gargoyle"):
+        if event.source in ("Army of the Dead", "Ghoul", "Ebon Gargoyle"):
             return
 
-        if event.get("ability") == "Gargoyle Strike":
-            self._pet_names[event["sourceID"]] = "Ebon Gargoyle"
-        if event.get("ability") == "Claw":
-            if event.get("sourceInstance", 0) > 0:
-                self._pet_names[event["sourceID"]] = "Army of the Dead"
+        ability = getattr(event, "ability", None)
+        if ability == "Gargoyle Strike":
+            self._pet_names[event.sourceID] = "Ebon Gargoyle"
+        if ability == "Claw":
+            if getattr(event, "sourceInstance", 0) > 0:
+                self._pet_names[event.sourceID] = "Army of the Dead"
             else:
-                self._pet_names[event["sourceID"]] = "Ghoul"
+                self._pet_names[event.sourceID] = "Ghoul"
 
     def decorate_event(self, event):
-        if event.get("sourceID") in self._pet_names:
-            event["source"] = self._pet_names[event["sourceID"]]
+        source_id = getattr(event, "sourceID", None)
+        if source_id in self._pet_names:
+            event.source = self._pet_names[source_id]
 
 
 class RPAnalyzer(BaseAnalyzer):
+    EVENT_TYPES = frozenset({"cast", "resourcechange"})
+
     def __init__(self):
         self._count_wasted = 0
         self._sum_wasted = 0
@@ -724,12 +876,12 @@ class RPAnalyzer(BaseAnalyzer):
         self._sum_gained = 0
 
     def add_event(self, event):
-        if event["type"] == "cast" and event.get("runic_power_waste", 0) > 0:
+        if event.type == "cast" and getattr(event, "runic_power_waste", 0) > 0:
             self._count_wasted += 1
-            self._sum_wasted += event["runic_power_waste"] // 10
-        if event["type"] == "resourcechange" and "runic_power_gained_ams" in event:
+            self._sum_wasted += event.runic_power_waste // 10
+        if event.type == "resourcechange" and hasattr(event, "runic_power_gained_ams"):
             self._count_gained += 1
-            self._sum_gained += event["runic_power_gained_ams"] // 10
+            self._sum_gained += event.runic_power_gained_ams // 10
 
     def print(self):
         console.print(
@@ -761,30 +913,33 @@ class RPAnalyzer(BaseAnalyzer):
 
 
 class GCDAnalyzer(BaseAnalyzer):
-    NO_GCD = {
-        "Unbreakable Armor",
-        "Blood Tap",
-        "Global Thermal Sapper Charge",
-        "Saronite Bomb",
-        "Speed",
-        "Empower Rune Weapon",
-        "Cobalt Frag Bomb",
-        "Hyperspeed Acceleration",
-        "Blood Fury",
-        "Berserking",
-        "Indestructible",
-        "Deathchill",
-        "Melee",
-        "Path of Illidan",
-        "Anti-Magic Shell",
-        "Unholy Frenzy",
-        "Wrathstone",
-        "Mark of Norgannon",
-        "Mind Freeze",
-        "Blood Presence",
-        "Frost Presence",
-        "Unholy Presence",
-    }
+    EVENT_TYPES = frozenset({"cast"})
+    NO_GCD = name_set(
+        {
+            "Unbreakable Armor",
+            "Blood Tap",
+            "Global Thermal Sapper Charge",
+            "Saronite Bomb",
+            "Speed",
+            "Empower Rune Weapon",
+            "Cobalt Frag Bomb",
+            "Hyperspeed Acceleration",
+            "Blood Fury",
+            "Berserking",
+            "Indestructible",
+            "Deathchill",
+            "Melee",
+            "Path of Illidan",
+            "Anti-Magic Shell",
+            "Unholy Frenzy",
+            "Wrathstone",
+            "Mark of Norgannon",
+            "Mind Freeze",
+            "Blood Presence",
+            "Frost Presence",
+            "Unholy Presence",
+        }
+    )
 
     def __init__(self, source_id, buff_tracker: BuffTracker):
         self._gcds = []
@@ -793,33 +948,33 @@ class GCDAnalyzer(BaseAnalyzer):
         self._buff_tracker = buff_tracker
 
     def add_event(self, event):
-        if not event["type"] == "cast":
+        if not event.type == "cast":
             return
 
-        if event["sourceID"] != self._source_id:
+        if event.sourceID != self._source_id:
             return
 
         if self._last_event is None:
-            offset = event["timestamp"]
+            offset = event.timestamp
             last_timestamp = 0
         else:
-            if event["recent_dead_zone"]:
-                if event["in_dead_zone"]:
-                    last_timestamp = event["timestamp"]
+            if event.recent_dead_zone:
+                if event.in_dead_zone:
+                    last_timestamp = event.timestamp
                 else:
                     last_timestamp = max(
-                        event["recent_dead_zone"][1], self._last_event["timestamp"]
+                        event.recent_dead_zone[1], self._last_event.timestamp
                     )
             else:
-                last_timestamp = self._last_event["timestamp"]
+                last_timestamp = self._last_event.timestamp
 
-            offset = event["timestamp"] - last_timestamp
+            offset = event.timestamp - last_timestamp
 
-        event["gcd_offset"] = offset
-        event["has_gcd"] = event["ability"] not in self.NO_GCD
+        event.gcd_offset = offset
+        event.has_gcd = event.ability not in self.NO_GCD
 
-        if event["has_gcd"]:
-            self._gcds.append((event["timestamp"], last_timestamp))
+        if event.has_gcd:
+            self._gcds.append((event.timestamp, last_timestamp))
             self._last_event = event
 
     @property
@@ -865,6 +1020,8 @@ class GCDAnalyzer(BaseAnalyzer):
 
 
 class DiseaseAnalyzer(BaseAnalyzer):
+    EVENT_TYPES = frozenset({"removedebuff"})
+    ABILITIES = name_set({"Blood Plague", "Frost Fever"})
     DISEASE_DURATION_MS = 15000
 
     def __init__(self, encounter_name, fight_end_time):
@@ -874,19 +1031,19 @@ class DiseaseAnalyzer(BaseAnalyzer):
 
     def add_event(self, event):
         if (
-            event["type"] == "removedebuff"
-            and event["ability"]
+            event.type == "removedebuff"
+            and event.ability
             in (
                 "Blood Plague",
                 "Frost Fever",
             )
-            and event["target_is_boss"]
-            and (self._encounter_name != "Thaddius" or not event["in_dead_zone"])
+            and event.target_is_boss
+            and (self._encounter_name != "Thaddius" or not event.in_dead_zone)
         ):
-            if not event["target_dies_at"] or (
-                event["target_dies_at"] - event["timestamp"] > 10000
+            if not event.target_dies_at or (
+                event.target_dies_at - event.timestamp > 10000
             ):
-                self._dropped_diseases_timestamp.append(event["timestamp"])
+                self._dropped_diseases_timestamp.append(event.timestamp)
 
     @property
     def num_diseases_dropped(self):
@@ -928,19 +1085,22 @@ class DiseaseAnalyzer(BaseAnalyzer):
 
 
 class BombAnalyzer(BaseAnalyzer):
+    EVENT_TYPES = frozenset({"cast"})
+    ABILITIES = name_set({"Global Thermal Sapper Charge", "Saronite Bomb"})
+
     def __init__(self, fight_duration):
         self._fight_duration = fight_duration
         self._num_thermals = 0
         self._num_saronites = 0
 
     def add_event(self, event):
-        if event["type"] != "cast":
+        if event.type != "cast":
             return
 
-        if event["ability"] == "Global Thermal Sapper Charge":
+        if event.ability == "Global Thermal Sapper Charge":
             self._num_thermals += 1
 
-        if event["ability"] == "Saronite Bomb":
+        if event.ability == "Saronite Bomb":
             self._num_saronites += 1
 
     @property
@@ -978,12 +1138,15 @@ class BombAnalyzer(BaseAnalyzer):
 
 
 class HyperspeedAnalyzer(BaseAnalyzer):
+    EVENT_TYPES = frozenset({"cast"})
+    ABILITIES = name_set({"Hyperspeed Acceleration"})
+
     def __init__(self, fight_duration):
         self._fight_duration = fight_duration
         self._num_hyperspeeds = 0
 
     def add_event(self, event):
-        if event["type"] == "cast" and event["ability"] == "Hyperspeed Acceleration":
+        if event.type == "cast" and event.ability == "Hyperspeed Acceleration":
             self._num_hyperspeeds += 1
 
     @property
@@ -1007,25 +1170,28 @@ class HyperspeedAnalyzer(BaseAnalyzer):
 
 
 class CoreAbilities(BaseAnalyzer):
-    CORE_ABILITIES = {
-        "Icy Touch",
-        "Plague Strike",
-        "Unbreakable Armor",
-        "Obliterate",
-        "Pestilence",
-        "Howling Blast",
-        "Blood Strike",
-        "Blood Boil",
-        "Death and Decay",
-        "Ghoul Frenzy",
-    }
+    EVENT_TYPES = frozenset({"cast"})
+    CORE_ABILITIES = name_set(
+        {
+            "Icy Touch",
+            "Plague Strike",
+            "Unbreakable Armor",
+            "Obliterate",
+            "Pestilence",
+            "Howling Blast",
+            "Blood Strike",
+            "Blood Boil",
+            "Death and Decay",
+            "Ghoul Frenzy",
+        }
+    )
 
     def add_event(self, event):
-        if event["type"] == "cast":
-            if event["ability"] in self.CORE_ABILITIES:
-                event["is_core_cast"] = True
+        if event.type == "cast":
+            if event.ability in self.CORE_ABILITIES:
+                event.is_core_cast = True
             else:
-                event["is_core_cast"] = False
+                event.is_core_cast = False
 
 
 class MeleeUptimeAnalyzer(BaseAnalyzer):
@@ -1039,6 +1205,7 @@ class MeleeUptimeAnalyzer(BaseAnalyzer):
         self._max_swing_speed = max_swing_speed
         self._event_predicate = event_predicate
         self._ignore_windows = ignore_windows
+        self._uptime = None
 
     def predicate(self, event):
         if self._event_predicate is None:
@@ -1047,32 +1214,31 @@ class MeleeUptimeAnalyzer(BaseAnalyzer):
 
     def add_event(self, event):
         if self._window and self._window.end is None:
-            if event["timestamp"] - self._last_swing_at >= self._max_swing_speed:
+            if event.timestamp - self._last_swing_at >= self._max_swing_speed:
                 self._window.end = min(
                     self._last_swing_at + self._max_swing_speed / 2,
                     self._fight_duration,
                 )
 
-        if (
-            self.predicate(event)
-            and event["type"] == "cast"
-            and event["ability"] == "Melee"
-        ):
+        if self.predicate(event) and event.type == "cast" and event.ability == "Melee":
             if self._window is None or self._window.end is not None:
-                self._window = Window(event["timestamp"])
+                self._window = Window(event.timestamp)
                 self._windows.append(self._window)
-            self._last_swing_at = event["timestamp"]
+            self._last_swing_at = event.timestamp
 
-    def uptime(self):
+    def finalize(self):
         if self._windows and self._windows[-1].end is None:
             self._windows[-1].end = self._fight_duration
 
-        return calculate_uptime(
+        self._uptime = calculate_uptime(
             self._windows,
             self._ignore_windows,
             self._fight_duration,
         )
 
+    def uptime(self):
+        return self._uptime
+
     def score(self):
         return self.uptime()
 
@@ -1083,6 +1249,8 @@ class MeleeUptimeAnalyzer(BaseAnalyzer):
 
 
 class TrinketAnalyzer(BaseAnalyzer):
+    EVENT_TYPES = frozenset({"applybuff"})
+
     def __init__(self, fight_duration, items: ItemPreprocessor):
         self._fight_duration = fight_duration
         self._items = items
@@ -1095,8 +1263,8 @@ class TrinketAnalyzer(BaseAnalyzer):
         )
 
     def add_event(self, event):
-        if event["type"] == "applybuff" and self._items.has_trinket(event["ability"]):
-            self._trinket_usages[event["ability"]] += 1
+        if event.type == "applybuff" and self._items.has_trinket(event.ability):
+            self._trinket_usages[event.ability] += 1
 
     def report(self):
         return {
@@ -1155,6 +1323,9 @@ class T9UptimeAnalyzer(BaseAnalyzer):
 
         self._t9_uptime.add_event(event)
 
+    def finalize(self):
+        self._t9_uptime.finalize()
+
     def report(self):
         if not self._has_2p:
             return {}
@@ -1204,6 +1375,10 @@ class SigilUptimeAnalyzer(BaseAnalyzer):
 
         self._sigil_uptime.add_event(event)
 
+    def finalize(self):
+        if self._sigil_uptime:
+            self._sigil_uptime.finalize()
+
     def report(self):
         if not self._sigil_uptime:
             return {}
@@ -1242,6 +1417,7 @@ class BuffUptimeAnalyzer(BaseAnalyzer):
         self._max_duration = max_duration
         self._buff_tracker = buff_tracker
         self._ignore_windows = ignore_windows
+        self._uptime = None
 
         if isinstance(buff_names, set):
             self._buff_names = buff_names
@@ -1274,7 +1450,7 @@ class BuffUptimeAnalyzer(BaseAnalyzer):
 
         return clamped_windows
 
-    def uptime(self):
+    def finalize(self):
         windows = list(self._get_windows())
         windows = self._clamp_windows(windows)
         ignore_windows = self._clamp_windows(self._ignore_windows)
@@ -1283,7 +1459,10 @@ class BuffUptimeAnalyzer(BaseAnalyzer):
         uptime = calculate_uptime(
             windows, ignore_windows, total_duration, self._max_duration
         )
-        return min(1, uptime)
+        self._uptime = min(1, uptime)
+
+    def uptime(self):
+        return self._uptime
 
     def score(self):
         return self.uptime()
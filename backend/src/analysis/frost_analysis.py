@@ -1,4 +1,4 @@
-from analysis.base import AnalysisScorer, BaseAnalyzer, Window
+from analysis.base import AnalysisScorer, BaseAnalyzer, Window, name_set
 from analysis.core_analysis import (
     BombAnalyzer,
     BuffTracker,
@@ -15,6 +15,9 @@ from report import Fight
 
 
 class KMAnalyzer(BaseAnalyzer):
+    EVENT_TYPES = frozenset({"applybuff", "refreshbuff", "removebuff"})
+    ABILITIES = name_set({"Killing Machine"})
+
     class Window:
         def __init__(self, timestamp):
             self.gained_timestamp = timestamp
@@ -25,16 +28,16 @@ class KMAnalyzer(BaseAnalyzer):
         self._window = None
 
     def add_event(self, event):
-        if event.get("ability") != "Killing Machine":
+        if getattr(event, "ability", None) != "Killing Machine":
             return
 
-        if event["type"] in ("refreshbuff", "applybuff"):
-            self._window = self.Window(event["timestamp"])
+        if event.type in ("refreshbuff", "applybuff"):
+            self._window = self.Window(event.timestamp)
             self._windows.append(self._window)
         # Could have no window if a previous KM proc was carried over
-        if event["type"] == "removebuff" and self._window:
-            if event["timestamp"] - self._window.gained_timestamp < 30000:
-                self._window.used_timestamp = event["timestamp"]
+        if event.type == "removebuff" and self._window:
+            if event.timestamp - self._window.gained_timestamp < 30000:
+                self._window.used_timestamp = event.timestamp
             self._window = None
 
     def print(self):
@@ -138,26 +141,26 @@ class UAAnalyzer(BaseAnalyzer):
         return 0
 
     def add_event(self, event):
-        if event["type"] == "applybuff" and event["ability"] == "Unbreakable Armor":
-            expected_oblits = self._get_expected_oblits(event["timestamp"])
+        if event.type == "applybuff" and event.ability == "Unbreakable Armor":
+            expected_oblits = self._get_expected_oblits(event.timestamp)
             self._window = self.Window(expected_oblits)
             self._windows.append(self._window)
-        elif event["type"] == "removebuff" and event["ability"] == "Unbreakable Armor":
+        elif event.type == "removebuff" and event.ability == "Unbreakable Armor":
             self._window = None
-        elif self._window and not event.get("is_miss"):
-            if event["type"] == "cast" and event["ability"] == "Empower Rune Weapon":
+        elif self._window and not getattr(event, "is_miss", None):
+            if event.type == "cast" and event.ability == "Empower Rune Weapon":
                 self._window.expected_oblits = 6
                 self._window.with_erw = True
             if (
-                event["type"] == "cast"
+                event.type == "cast"
                 and (
-                    event["ability"] == "Obliterate"
+                    event.ability == "Obliterate"
                     or (
-                        event["ability"] == "Howling Blast"
-                        and not event.get("consumes_rime")
+                        event.ability == "Howling Blast"
+                        and not getattr(event, "consumes_rime", None)
                     )
                 )
-                and not event["is_miss"]
+                and not event.is_miss
             ):
                 self._window.oblits += 1
 
@@ -249,19 +252,22 @@ class UAAnalyzer(BaseAnalyzer):
 
 
 class HowlingBlastAnalyzer(BaseAnalyzer):
+    EVENT_TYPES = frozenset({"cast"})
+    ABILITIES = name_set({"Howling Blast"})
+
     def __init__(self):
         self._bad_usages = 0
 
     def add_event(self, event):
-        if event["type"] == "cast" and event["ability"] == "Howling Blast":
-            if event["num_targets"] >= 3 or event["consumes_rime"]:
+        if event.type == "cast" and event.ability == "Howling Blast":
+            if event.num_targets >= 3 or event.consumes_rime:
                 is_bad = False
-            elif event["num_targets"] == 2 and event["consumes_km"]:
+            elif event.num_targets == 2 and event.consumes_km:
                 is_bad = False
             else:
                 is_bad = True
 
-            event["bad_howling_blast"] = is_bad
+            event.bad_howling_blast = is_bad
             if is_bad:
                 self._bad_usages += 1
 
@@ -292,14 +298,16 @@ class HowlingBlastAnalyzer(BaseAnalyzer):
 
 
 class RimeAnalyzer(BaseAnalyzer):
+    EVENT_TYPES = frozenset({"applybuff", "refreshbuff", "cast"})
+
     def __init__(self, buff_tracker: BuffTracker):
         self._num_total = 1 if buff_tracker.is_active("Rime", 0) else 0
         self._num_used = 0
 
     def add_event(self, event):
-        if event["type"] in ("applybuff", "refreshbuff") and event["ability"] == "Rime":
+        if event.type in ("applybuff", "refreshbuff") and event.ability == "Rime":
             self._num_total += 1
-        if event.get("consumes_rime"):
+        if getattr(event, "consumes_rime", None):
             self._num_used += 1
 
     def score(self):
@@ -320,6 +328,9 @@ class RimeAnalyzer(BaseAnalyzer):
 
 
 class RaiseDeadAnalyzer(BaseAnalyzer):
+    EVENT_TYPES = frozenset({"cast"})
+    ABILITIES = name_set({"Raise Dead"})
+
     def __init__(self, fight_end_time):
         self._num_raise_deads = 0
         self._fight_end_time = fight_end_time
@@ -329,7 +340,7 @@ class RaiseDeadAnalyzer(BaseAnalyzer):
         return max(1 + (self._fight_end_time - 20000) // 183000, self._num_raise_deads)
 
     def add_event(self, event):
-        if event["type"] == "cast" and event["ability"] == "Raise Dead":
+        if event.type == "cast" and event.ability == "Raise Dead":
             self._num_raise_deads += 1
 
     def score(self):
@@ -345,17 +356,16 @@ class RaiseDeadAnalyzer(BaseAnalyzer):
 
 
 class ObliterateAnalyzer(BaseAnalyzer):
+    EVENT_TYPES = frozenset({"cast"})
+    ABILITIES = name_set({"Obliterate"})
+
     def __init__(self, fight_end_time, ignore_windows):
         self._num_obliterates = 0
         self._fight_end_time = fight_end_time
         self._ignore_windows = ignore_windows
 
     def add_event(self, event):
-        if (
-            event["type"] == "cast"
-            and event["ability"] == "Obliterate"
-            and not event["is_miss"]
-        ):
+        if event.type == "cast" and event.ability == "Obliterate" and not event.is_miss:
             self._num_obliterates += 1
 
     def score(self):
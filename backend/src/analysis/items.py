@@ -89,14 +89,11 @@ class TrinketPreprocessor(BasePreprocessor):
         return trinkets
 
     def preprocess_event(self, event):
-        if (
-            event["type"] == "applybuff"
-            and event["ability"] in self.TRINKEY_MAP_BY_BUFF_NAME
-        ):
-            trinket = self.TRINKEY_MAP_BY_BUFF_NAME[event["ability"]]
-
-            if event["ability"] not in self._trinkets_by_buff_name:
-                trinket.icon = event["ability_icon"]
+        if event.type == "applybuff" and event.ability in self.TRINKEY_MAP_BY_BUFF_NAME:
+            trinket = self.TRINKEY_MAP_BY_BUFF_NAME[event.ability]
+
+            if event.ability not in self._trinkets_by_buff_name:
+                trinket.icon = event.ability_icon
                 self._trinkets.append(trinket)
                 self._trinkets_by_buff_name = {
                     trinket.buff_name: trinket for trinket in self._trinkets
@@ -173,7 +170,7 @@ class T9Preprocessor(BasePreprocessor):
             self.has_4p = True
 
     def preprocess_event(self, event):
-        if event["type"] == "applybuff" and event["ability"] == "Unholy Might":
+        if event.type == "applybuff" and event.ability == "Unholy Might":
             self.has_2p = True
 
     @property
@@ -209,11 +206,8 @@ class SigilPreprocessor(BasePreprocessor):
         if self.sigil:
             return
 
-        if (
-            event["type"] == "applybuff"
-            and event["ability"] in self._sigil_buff_name_map
-        ):
-            self.sigil = self._sigil_buff_name_map[event["ability"]]
+        if event.type == "applybuff" and event.ability in self._sigil_buff_name_map:
+            self.sigil = self._sigil_buff_name_map[event.ability]
 
 
 class ItemPreprocessor(BasePreprocessor):
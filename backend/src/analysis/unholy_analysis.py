@@ -4,9 +4,11 @@ from typing import List
 from analysis.base import (
     AnalysisScorer,
     BaseAnalyzer,
+    IntervalSet,
     ScoreWeight,
+    as_interval_set,
     calculate_uptime,
-    combine_windows,
+    name_set,
     Window,
 )
 from analysis.core_analysis import (
@@ -26,6 +28,8 @@ from report import Fight
 
 
 class DebuffUptimeAnalyzer(BaseAnalyzer):
+    EVENT_TYPES = frozenset({"applydebuff", "removedebuff", "refreshdebuff"})
+
     class WindowManager:
         def __init__(self, end_time):
             self._windows_by_target = defaultdict(list)
@@ -57,41 +61,47 @@ class DebuffUptimeAnalyzer(BaseAnalyzer):
                 if window.end is None:
                     window.end = self._end_time
 
-            return combine_windows(windows)
+            return IntervalSet(windows)
 
     def __init__(self, end_time, debuff_name, ignore_windows):
         self._debuff_name = debuff_name
         self._end_time = end_time
         self._ignore_windows = ignore_windows
         self._wm = self.WindowManager(end_time)
+        self._uptime = None
 
     def add_event(self, event):
-        if event["type"] not in ("applydebuff", "removedebuff", "refreshdebuff"):
+        if event.type not in ("applydebuff", "removedebuff", "refreshdebuff"):
             return
 
-        if event["ability"] != self._debuff_name:
+        if event.ability != self._debuff_name:
             return
 
-        if event["type"] in ("applydebuff", "refreshdebuff"):
-            if not self._wm.has_active_window(event["target"]):
-                self._wm.add_window(event["target"], event["timestamp"])
-        elif event["type"] == "removedebuff":
-            self._wm.end_window(event["target"], event["timestamp"])
+        if event.type in ("applydebuff", "refreshdebuff"):
+            if not self._wm.has_active_window(event.target):
+                self._wm.add_window(event.target, event.timestamp)
+        elif event.type == "removedebuff":
+            self._wm.end_window(event.target, event.timestamp)
 
-    def uptime(self):
+    def finalize(self):
         windows = self._wm.coalesce()
 
-        return calculate_uptime(
+        self._uptime = calculate_uptime(
             windows,
             self._ignore_windows,
             self._end_time,
         )
 
+    def uptime(self):
+        return self._uptime
+
     def score(self):
         return self.uptime()
 
 
 class BloodPlagueAnalyzer(DebuffUptimeAnalyzer):
+    ABILITIES = name_set({"Blood Plague"})
+
     def __init__(self, end_time, ignore_windows):
         super().__init__(end_time, "Blood Plague", ignore_windows)
 
@@ -102,6 +112,8 @@ class BloodPlagueAnalyzer(DebuffUptimeAnalyzer):
 
 
 class FrostFeverAnalyzer(DebuffUptimeAnalyzer):
+    ABILITIES = name_set({"Frost Fever"})
+
     def __init__(self, end_time, ignore_windows):
         super().__init__(end_time, "Frost Fever", ignore_windows)
 
@@ -230,6 +242,7 @@ class GargoyleWindow(Window):
         self._uptime_trinkets = []
         self.trinket_snapshots = []
         self.trinket_uptimes = []
+        self._score = None
 
         for trinket in self._items.trinkets:
             if trinket.snapshots_gargoyle:
@@ -287,30 +300,38 @@ class GargoyleWindow(Window):
         return self._berserking_uptime.uptime() if self._berserking_uptime else None
 
     def _set_gargoyle_first_cast(self, event):
-        self._gargoyle_first_cast = event["timestamp"]
+        self._gargoyle_first_cast = event.timestamp
         for uptime in self._uptimes:
-            uptime.set_start_time(event["timestamp"])
+            uptime.set_start_time(event.timestamp)
 
     def add_event(self, event):
         for uptime in self._uptimes:
             uptime.add_event(event)
 
-        if event["source"] == "Ebon Gargoyle":
+        if event.source == "Ebon Gargoyle":
             if (
-                event["type"] in ("cast", "startcast")
+                event.type in ("cast", "startcast")
                 and self._gargoyle_first_cast is None
             ):
                 self._set_gargoyle_first_cast(event)
-            if event["type"] == "cast":
-                if event["ability"] == "Melee":
+            if event.type == "cast":
+                if event.ability == "Melee":
                     self.num_melees += 1
-                if event["ability"] == "Gargoyle Strike":
+                if event.ability == "Gargoyle Strike":
                     self.num_casts += 1
 
-        if event["type"] == "damage" and event["source"] == "Ebon Gargoyle":
-            self.total_damage += event["amount"]
+        if event.type == "damage" and event.source == "Ebon Gargoyle":
+            self.total_damage += event.amount
+
+    def finalize(self):
+        for uptime in self._uptimes:
+            uptime.finalize()
+        self._score = self._calculate_score()
 
     def score(self):
+        return self._score
+
+    def _calculate_score(self):
         return ScoreWeight.calculate(
             ScoreWeight(int(self.snapshotted_greatness), 2),
             ScoreWeight(int(self.snapshotted_fc), 3),
@@ -357,11 +378,12 @@ class GargoyleAnalyzer(BaseAnalyzer):
         self._fight_duration = fight_duration
         self._ignore_windows = ignore_windows
         self._items = items
+        self._score = None
 
     def add_event(self, event):
-        if event["type"] == "cast" and event["ability"] == "Summon Gargoyle":
+        if event.type == "cast" and event.ability == "Summon Gargoyle":
             self._window = GargoyleWindow(
-                event["timestamp"],
+                event.timestamp,
                 self._fight_duration,
                 self._buff_tracker,
                 self._ignore_windows,
@@ -378,16 +400,22 @@ class GargoyleAnalyzer(BaseAnalyzer):
     def possible_gargoyles(self):
         return max(1 + (self._fight_duration - 10000) // 183000, len(self.windows))
 
-    def score(self):
+    def finalize(self):
+        for window in self.windows:
+            window.finalize()
+
         window_score = sum(window.score() for window in self.windows)
         used_speed = any(window.speed_uptime for window in self.windows)
-        return ScoreWeight.calculate(
+        self._score = ScoreWeight.calculate(
             ScoreWeight(int(used_speed), 1),
             ScoreWeight(
                 window_score / self.possible_gargoyles, 5 * self.possible_gargoyles
             ),
         )
 
+    def score(self):
+        return self._score
+
     def report(self):
         return {
             "gargoyle": {
@@ -447,29 +475,26 @@ class GargoyleAnalyzer(BaseAnalyzer):
 
 
 class DeathAndDecayUptimeAnalyzer(BaseAnalyzer):
+    EVENT_TYPES = frozenset({"damage"})
+    ABILITIES = name_set({"Death and Decay"})
+
     def __init__(self, fight_duration, ignore_windows, items):
         self._dnd_ticks = 0
         self._last_tick_time = None
-        self._ignore_windows = ignore_windows
+        self._ignore_windows = as_interval_set(ignore_windows)
         self._has_sigil = items.sigil is not None
 
-        ignore_duration = sum(window.duration for window in self._ignore_windows)
+        ignore_duration = sum(window.duration for window in ignore_windows)
         self._fight_duration = fight_duration - ignore_duration
 
-    def _is_in_ignore_window(self, timestamp):
-        for window in self._ignore_windows:
-            if window.start <= timestamp <= window.end:
-                return True
-        return False
-
     def add_event(self, event):
-        if event["type"] == "damage" and event["ability"] == "Death and Decay":
+        if event.type == "damage" and event.ability == "Death and Decay":
             if (
                 self._last_tick_time is None
-                or event["timestamp"] - self._last_tick_time > 800
-            ) and not self._is_in_ignore_window(event["timestamp"]):
+                or event.timestamp - self._last_tick_time > 800
+            ) and not self._ignore_windows.contains(event.timestamp):
                 self._dnd_ticks += 1
-                self._last_tick_time = event["timestamp"]
+                self._last_tick_time = event.timestamp
 
     @property
     def max_uptime(self):
@@ -506,14 +531,16 @@ class GhoulAnalyzer(BaseAnalyzer):
         self._window = None
         self.total_damage = 0
         self._ignore_windows = ignore_windows
+        self._uptime = None
 
     def _is_ghoul(self, event):
-        if not event["is_owner_pet_source"] and not event["is_owner_pet_target"]:
+        if not event.is_owner_pet_source and not event.is_owner_pet_target:
             return False
 
-        if event["source"] in ("Army of the Dead", "Ebon Gargoyle") or event[
-            "target"
-        ] in ("Army of the Dead", "Ebon Gargoyle"):
+        if event.source in ("Army of the Dead", "Ebon Gargoyle") or event.target in (
+            "Army of the Dead",
+            "Ebon Gargoyle",
+        ):
             return False
 
         return True
@@ -523,11 +550,11 @@ class GhoulAnalyzer(BaseAnalyzer):
         self._melee_uptime.add_event(event)
 
         # Ghoul was revived
-        if event["type"] == "cast" and event["ability"] == "Raise Dead":
+        if event.type == "cast" and event.ability == "Raise Dead":
             # It seems this can happen if the ghoul is dismissed
             if self._window and self._window.end is None:
-                self._window.end = event["timestamp"]
-            self._window = Window(event["timestamp"])
+                self._window.end = event.timestamp
+            self._window = Window(event.timestamp)
             self._windows.append(self._window)
             return
 
@@ -539,32 +566,37 @@ class GhoulAnalyzer(BaseAnalyzer):
             self._window = Window(0)
             self._windows.append(self._window)
 
-        if event["is_owner_pet_source"]:
-            if event["type"] == "cast" and event["ability"] == "Claw":
+        if event.is_owner_pet_source:
+            if event.type == "cast" and event.ability == "Claw":
                 self._num_claws += 1
-            elif event["type"] == "cast" and event["ability"] == "Gnaw":
+            elif event.type == "cast" and event.ability == "Gnaw":
                 self._num_gnaws += 1
-            elif event["type"] == "damage":
-                self.total_damage += event["amount"]
-        elif event["is_owner_pet_target"]:
+            elif event.type == "damage":
+                self.total_damage += event.amount
+        elif event.is_owner_pet_target:
             # Ghoul has died
-            if event["type"] == "damage" and event.get("overkill"):
-                self._window.end = event["timestamp"]
+            if event.type == "damage" and getattr(event, "overkill", None):
+                self._window.end = event.timestamp
 
     @property
     def melee_uptime(self):
         return self._melee_uptime.uptime()
 
-    def uptime(self):
+    def finalize(self):
+        self._melee_uptime.finalize()
+
         if self._windows and self._windows[-1].end is None:
             self._windows[-1].end = self._fight_duration
 
-        return calculate_uptime(
+        self._uptime = calculate_uptime(
             self._windows,
             self._ignore_windows,
             self._fight_duration,
         )
 
+    def uptime(self):
+        return self._uptime
+
     def score(self):
         return ScoreWeight.calculate(
             ScoreWeight(min(1, self.claw_cpm / 15), 4),
@@ -604,11 +636,17 @@ class BloodPresenceUptimeAnalyzer(BaseAnalyzer):
         # Gargoyle windows are modified throughout the fight
         self._gargoyle_windows = gargoyle_windows
         self._fight_duration = fight_duration
+        self._uptime = None
 
-    def uptime(self):
+    def finalize(self):
         windows = self._buff_tracker.get_windows("Blood Presence")
-        ignore_windows = combine_windows(self._ignore_windows, self._gargoyle_windows)
-        return calculate_uptime(windows, ignore_windows, self._fight_duration)
+        ignore_windows = as_interval_set(self._ignore_windows).union(
+            IntervalSet(self._gargoyle_windows)
+        )
+        self._uptime = calculate_uptime(windows, ignore_windows, self._fight_duration)
+
+    def uptime(self):
+        return self._uptime
 
     def score(self):
         return self.uptime()
@@ -632,6 +670,7 @@ class SnapshottableBuff:
 
 
 class ArmyAnalyzer(BaseAnalyzer):
+    EVENT_TYPES = frozenset({"cast", "damage"})
     INCLUDE_PET_EVENTS = True
 
     def __init__(self, buff_tracker: BuffTracker, items: ItemPreprocessor):
@@ -651,10 +690,10 @@ class ArmyAnalyzer(BaseAnalyzer):
             self._snapshottable_buffs.append(SnapshottableBuff("Berserking", "Berserking"))
 
     def add_event(self, event):
-        if event["type"] == "cast" and event["ability"] == "Army of the Dead":
+        if event.type == "cast" and event.ability == "Army of the Dead":
             for trinket in self._snapshottable_trinkets:
                 did_snapshot = self._buff_tracker.is_active(
-                    trinket.buff_name, event["timestamp"]
+                    trinket.buff_name, event.timestamp
                 )
                 self._snapshots.append(
                     {
@@ -668,13 +707,13 @@ class ArmyAnalyzer(BaseAnalyzer):
                     {
                         "name": buff.display_name,
                         "did_snapshot": buff.is_active(
-                            self._buff_tracker, event["timestamp"]
+                            self._buff_tracker, event.timestamp
                         ),
                     }
                 )
 
-        if event["type"] == "damage" and event["source"] == "Army of the Dead":
-            self.total_damage += event["amount"]
+        if event.type == "damage" and event.source == "Army of the Dead":
+            self.total_damage += event.amount
 
     def report(self):
         return {
@@ -694,6 +733,9 @@ class ArmyAnalyzer(BaseAnalyzer):
 
 
 class BloodTapAnalyzer(BaseAnalyzer):
+    EVENT_TYPES = frozenset({"cast"})
+    ABILITIES = name_set({"Blood Tap"})
+
     def __init__(self, fight_end_time):
         self._num_used = 0
         self._fight_end_time = fight_end_time
@@ -703,7 +745,7 @@ class BloodTapAnalyzer(BaseAnalyzer):
         return max(1 + (self._fight_end_time - 10000) // 60000, self._num_used)
 
     def add_event(self, event):
-        if event["type"] == "cast" and event["ability"] == "Blood Tap":
+        if event.type == "cast" and event.ability == "Blood Tap":
             self._num_used += 1
 
     def score(self):
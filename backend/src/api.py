@@ -5,12 +5,23 @@ from typing import Dict
 
 import sentry_sdk
 from fastapi import FastAPI, Response
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from sentry_sdk.integrations.aws_lambda import AwsLambdaIntegration
 
-from client import fetch_report, PrivateReport, TemporaryUnavailable
-from analysis.analyze import analyze
+from cache import SingleFlight
+from client import (
+    close_session,
+    fetch_report,
+    get_report_cache,
+    is_report_immutable,
+    PrivateReport,
+    TemporaryUnavailable,
+    WCLClient,
+)
+from analysis.analyze import analyze, ANALYSIS_VERSION
+from executor import get_executor, shutdown_executor
 
 SENTRY_ENABLED = os.environ.get("AWS_EXECUTION_ENV") is not None
 if SENTRY_ENABLED:
@@ -23,6 +34,12 @@ if SENTRY_ENABLED:
 app = FastAPI()
 
 
+@app.on_event("shutdown")
+async def shutdown():
+    await close_session()
+    shutdown_executor()
+
+
 async def catch_exceptions_middleware(request, call_next):
     try:
         return await call_next(request)
@@ -48,6 +65,37 @@ class AnalyzeResponse(BaseModel):
     data: Dict
 
 
+# Raid members tend to open the same log at the same time, analyze it only once
+_analyze_flights = SingleFlight()
+
+
+def _analyze_and_encode(report, fight_id):
+    return jsonable_encoder(analyze(report, fight_id))
+
+
+async def _analyze_fight(report_id, fight_id, source_id):
+    # Keyed by the analysis version, so a deploy doesn't serve stale results
+    key = ("result", report_id, fight_id, source_id, ANALYSIS_VERSION)
+    result_cache = get_report_cache()
+
+    result = await result_cache.get_async(key)
+    if result is not None:
+        return result["data"], result["end_time"]
+
+    report = await fetch_report(report_id, fight_id, source_id)
+    # Analysis is CPU bound, run it elsewhere so it doesn't block other requests
+    events = await get_executor().run(_analyze_and_encode, report, fight_id)
+
+    # Which fight -1 refers to, and the fight itself, can only change while
+    # the report is being logged. Missing rankings would be filled in later
+    if is_report_immutable(report.end_time) and report.has_rankings:
+        result_cache.set_in_background(
+            key, {"data": events, "end_time": report.end_time}
+        )
+
+    return events, report.end_time
+
+
 @app.get("/analyze_fight")
 async def analyze_fight(
     response: Response, report_id: str, fight_id: int, source_id: int
@@ -57,7 +105,10 @@ async def analyze_fight(
         return {"error": "Can not analyze while using the 'Compare' feature"}
 
     try:
-        report = await fetch_report(report_id, fight_id, source_id)
+        events, end_time = await _analyze_flights.run(
+            (report_id, fight_id, source_id),
+            lambda: _analyze_fight(report_id, fight_id, source_id),
+        )
     except PrivateReport:
         response.status_code = 403
         return {"error": "Can not analyze private reports"}
@@ -65,12 +116,21 @@ async def analyze_fight(
         response.status_code = 503
         return {"error": "Bad response from Warcraft Logs, try again"}
 
-    events = analyze(report, fight_id)
-
     # don't cache reports that are less than a day old
-    ended_ago = datetime.now() - datetime.fromtimestamp(report.end_time / 1000)
+    ended_ago = datetime.now() - datetime.fromtimestamp(end_time / 1000)
     if fight_id == -1 and ended_ago < timedelta(days=1):
         response.headers["Cache-Control"] = "no-cache"
     else:
         response.headers["Cache-Control"] = "max-age=86400"
     return {"data": events}
+
+
+@app.get("/stats")
+async def stats():
+    return {
+        "executor": get_executor().stats(),
+        "analyze_requests": _analyze_flights.stats(),
+        "fetches": WCLClient._fetches.stats(),
+        "memory_cache": WCLClient._cache.stats(),
+        "disk_cache": get_report_cache().stats(),
+    }
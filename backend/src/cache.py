@@ -0,0 +1,293 @@
+import asyncio
+import functools
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import zlib
+from collections import OrderedDict
+
+
+class DiskCache:
+    """
+    Persistent cache of JSON-serializable values, stored compressed on disk.
+    Least recently used entries are evicted once the cache grows past max_bytes
+    """
+
+    SUFFIX = ".json.z"
+
+    def __init__(self, directory, max_bytes):
+        self._directory = directory
+        self._max_bytes = max_bytes
+        self._size = None
+        # Writes happen in worker threads, the size accounting and eviction
+        # have to see each write as a whole
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, key):
+        digest = hashlib.sha1(repr(key).encode()).hexdigest()
+        return os.path.join(self._directory, digest + self.SUFFIX)
+
+    def get(self, key):
+        path = self._path(key)
+
+        try:
+            with open(path, "rb") as f:
+                value = json.loads(zlib.decompress(f.read()))
+        except FileNotFoundError:
+            self.misses += 1
+            return None
+        except (OSError, ValueError, zlib.error):
+            logging.warning(f"Removing unreadable cache entry {path}")
+            self._remove(path)
+            self.misses += 1
+            return None
+
+        # Bump the modification time, it's what the LRU eviction goes by
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        self.hits += 1
+        return value
+
+    async def get_async(self, key):
+        return await asyncio.to_thread(self.get, key)
+
+    def set(self, key, value):
+        self._write(key, self._serialize(value))
+
+    def set_in_background(self, key, value):
+        """
+        Stores value from a worker thread, without waiting for it to be written.
+        Only the serialized value is handed over, so the caller is free to keep
+        modifying the value. Returns the future of the write
+        """
+        data = self._serialize(value)
+
+        def write():
+            try:
+                self._write(key, data)
+            except Exception:
+                logging.exception("Failed to write cache entry")
+
+        return asyncio.get_running_loop().run_in_executor(None, write)
+
+    @staticmethod
+    def _serialize(value):
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    def _write(self, key, data):
+        data = zlib.compress(data)
+        if len(data) > self._max_bytes:
+            return
+
+        os.makedirs(self._directory, exist_ok=True)
+        path = self._path(key)
+        # Unique per write, other threads and processes may be writing the same key
+        fd, tmp_path = tempfile.mkstemp(dir=self._directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+
+        with self._lock:
+            try:
+                replaced_size = os.path.getsize(path)
+            except FileNotFoundError:
+                replaced_size = 0
+            os.replace(tmp_path, path)
+
+            if self._size is None:
+                self._evict()
+            else:
+                self._size += len(data) - replaced_size
+                if self._size > self._max_bytes:
+                    self._evict()
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def _evict(self):
+        """Called with the lock held"""
+        entries = []
+
+        with os.scandir(self._directory) as it:
+            for entry in it:
+                if entry.name.endswith(self.SUFFIX):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+
+        size = sum(entry_size for _, entry_size, _ in entries)
+        for _, entry_size, path in sorted(entries):
+            if size <= self._max_bytes:
+                break
+            self._remove(path)
+            size -= entry_size
+            self.evictions += 1
+
+        self._size = size
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time. Callers arriving while a call is
+    in flight await the same result (or exception) instead of calling again
+    """
+
+    def __init__(self):
+        self._tasks = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    async def run(self, key, fn):
+        task = self._tasks.get(key)
+        if task is None or task.get_loop() is not asyncio.get_running_loop():
+            task = asyncio.create_task(fn())
+            self._tasks[key] = task
+            task.add_done_callback(functools.partial(self._done, key))
+            self.calls += 1
+        else:
+            self.coalesced += 1
+
+        # Shielded, so a cancelled caller doesn't cancel the call for the others
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        # The callers may all be gone, don't log the exception as never retrieved
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self):
+        return {
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._tasks),
+        }
+
+
+def _json_size(value):
+    return len(json.dumps(value, separators=(",", ":")))
+
+
+class TTLCache:
+    """
+    In-memory cache bounded by number of entries and (estimated) size,
+    evicting the least recently used entries first. Entries can expire after a TTL
+    """
+
+    def __init__(self, max_entries, max_bytes, sizeof=_json_size):
+        self._max_entries = max_entries
+        self._max_bytes = max_bytes
+        self._sizeof = sizeof
+        # key -> (value, size, expiry)
+        self._entries = OrderedDict()
+        self._loads = SingleFlight()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, _, expiry = entry
+        if expiry is not None and expiry <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key, value, ttl=None):
+        """Stores value for ttl seconds, or until evicted if ttl is None"""
+        if ttl is not None and ttl <= 0:
+            return
+
+        size = self._sizeof(value)
+        if size > self._max_bytes:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        expiry = None if ttl is None else time.monotonic() + ttl
+        self._entries[key] = (value, size, expiry)
+        self._size += size
+        self._evict()
+
+    def delete(self, key):
+        if key in self._entries:
+            self._remove(key)
+
+    async def get_or_load(self, key, load, ttl=None):
+        """
+        Returns the cached value, or awaits load() to get it. Concurrent misses
+        for the same key share a single load. ttl may be a function of the value
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        value = await self._loads.run(key, load)
+        # Every caller sharing the load gets here, only the first has to store it
+        if value is not None and key not in self._entries:
+            self.set(key, value, ttl(value) if callable(ttl) else ttl)
+        return value
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+    def _evict(self):
+        if len(self._entries) <= self._max_entries and self._size <= self._max_bytes:
+            return
+
+        # Drop expired entries before evicting live ones
+        now = time.monotonic()
+        for key, (_, _, expiry) in list(self._entries.items()):
+            if expiry is not None and expiry <= now:
+                self._remove(key)
+                self.expirations += 1
+
+        while len(self._entries) > self._max_entries or self._size > self._max_bytes:
+            key = next(iter(self._entries))
+            self._remove(key)
+            self.evictions += 1
+
+    def stats(self):
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self._loads.coalesced,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "entries": len(self._entries),
+            "bytes": self._size,
+        }
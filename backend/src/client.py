@@ -1,10 +1,13 @@
 import logging
 import os
-from datetime import datetime
+import tempfile
+import time
+from datetime import datetime, timedelta
 
 import aiohttp
 import asyncio.exceptions
 import sentry_sdk
+from cache import DiskCache, SingleFlight, TTLCache
 from report import Report, Source
 
 
@@ -20,41 +23,62 @@ class TemporaryUnavailable(WCLClientException):
     pass
 
 
-class CacheWithExpiry:
-    def __init__(self):
-        self._cache = {}
+ZONES_TTL = 24 * 60 * 60
+METADATA_TTL = 60 * 60
 
-    def get(self, key):
-        if key not in self._cache:
-            return None
-        value, expiry = self._cache[key]
-        if expiry < datetime.utcnow():
-            del self._cache[key]
-            return None
-        return value
 
-    def set(self, key, value, expiry):
-        self._cache[key] = (value, datetime.utcnow() + expiry)
+def is_report_immutable(end_time):
+    """Reports that ended more than a day ago won't change anymore"""
+    ended_ago = datetime.now() - datetime.fromtimestamp(end_time / 1000)
+    return ended_ago > timedelta(days=1)
+
+
+def _metadata_ttl(report_metadata):
+    # Reports that are still being logged must be re-fetched every time
+    return METADATA_TTL if is_report_immutable(report_metadata["endTime"]) else 0
+
+
+def _zones_ttl(zones):
+    return zones["fetched_at"] + ZONES_TTL - time.time()
+
+
+def _discard_task(task):
+    """Cancel a task whose result is no longer needed, without logging its errors"""
+    task.cancel()
+    task.add_done_callback(lambda t: t.cancelled() or t.exception())
 
 
 class WCLClient:
     base_url = "https://classic.warcraftlogs.com/api/v2/client"
-    _auth = None
-    _zones = None
-    _cache = CacheWithExpiry()
-
-    def __init__(self, client_id, client_secret):
+    # Shared by all clients in the process, for zones, metadata and auth tokens
+    _cache = TTLCache(max_entries=1024, max_bytes=64 * 1024 * 1024)
+    # Rankings, deaths and combatant info are per fight, not per source, so
+    # concurrent queries for different sources in the same fight share them
+    _fetches = SingleFlight()
+
+    def __init__(
+        self,
+        client_id,
+        client_secret,
+        num_slices=4,
+        max_concurrency=4,
+        report_cache: DiskCache = None,
+    ):
         self._client_id = client_id
         self._client_secret = client_secret
-        self._session = None
+        self._report_cache = report_cache
+        # Events are fetched in num_slices time ranges, with at most
+        # max_concurrency requests in flight at once
+        self._num_slices = max(1, num_slices)
+        self._max_concurrency = max(1, max_concurrency)
 
     async def __aenter__(self):
-        self._session = aiohttp.ClientSession()
         return self
 
     async def __aexit__(self, *args):
-        await self._session.__aexit__(*args)
-        self._session = None
+        # The session is shared by the process and outlives the client, and
+        # so do coalesced fetches started by it that other queries still await
+        pass
 
     async def _fetch_metadata(self, report_code):
         metadata_query = (
@@ -96,99 +120,259 @@ class WCLClient:
         )
         return (await self._query(metadata_query, "metadata"))["data"]
 
-    async def _fetch_events(self, report_code, fight_id, source: Source):
-        deaths = []
-        events = []
-        combatant_info = []
-        next_page_timestamp = 0
-        rankings_query = """
-{
-    reportData {
-        report(code: "%(report_code)s") {
-            rankings(
-                playerMetric: dps
-                fightIDs: [%(fight_id)s]
-            )
-        }
-    }
-}
-""" % {
-            "report_code": report_code,
-            "fight_id": fight_id,
-        }
-
-        events_query_t = """
+    async def _fetch_events_page(
+        self,
+        report_code,
+        fight_id,
+        filters,
+        description,
+        semaphore,
+        start_time=0,
+        end_time=100000000000,
+    ):
+        events_query = """
 {
   reportData {
     report(code: "%(report_code)s") {
       events(
-        startTime: %(next_page_timestamp)s
-        endTime: 100000000000
-        sourceID: %(source_id)s
+        startTime: %(start_time)s
+        endTime: %(end_time)s
         useActorIDs: true
-        includeResources: true
         fightIDs: [%(fight_id)s]
         limit: 10000
+        %(filters)s
       ) {
         nextPageTimestamp
         data
       }
-      deaths: events(
-        startTime: 0
-        endTime: 100000000000
-        useActorIDs: true
-        sourceID: -1
-        fightIDs: [%(fight_id)s]
-        limit: 10000
-      ) {
-        data
-      }
-
-      combatantInfo: events(
-        startTime: 0
-        endTime: 100000000000
-        useActorIDs: true
-        dataType: CombatantInfo
-        fightIDs: [%(fight_id)s]
-        limit: 10000
-      ) {
-        data
-      }
     }
   }
 }
-"""
-        rankings_task = asyncio.create_task(
-            self._query(rankings_query, "rankings", timeout=1.5)
+""" % dict(
+            report_code=report_code,
+            start_time=start_time,
+            end_time=end_time,
+            fight_id=fight_id,
+            filters=filters,
         )
+        async with semaphore:
+            r = (await self._query(events_query, description))["data"]["reportData"][
+                "report"
+            ]
+        return r["events"]["data"], r["events"]["nextPageTimestamp"]
+
+    async def _fetch_event_pages(
+        self,
+        report_code,
+        fight_id,
+        filters,
+        description,
+        semaphore,
+        start_time=0,
+        end_time=100000000000,
+    ):
+        """
+        Fetch all events matching filters between start_time and end_time,
+        following pagination
+        """
+        events = []
+        num_requests = 0
+        next_page_timestamp = start_time
 
         while next_page_timestamp is not None:
-            events_query = events_query_t % dict(
-                report_code=report_code,
-                next_page_timestamp=next_page_timestamp,
-                source_id=source.id,
-                fight_id=fight_id,
+            page, next_page_timestamp = await self._fetch_events_page(
+                report_code,
+                fight_id,
+                filters,
+                description,
+                semaphore,
+                next_page_timestamp,
+                end_time,
             )
-            r = (await self._query(events_query, "events"))["data"]["reportData"][
-                "report"
+            num_requests += 1
+            events += page
+
+        return events, num_requests
+
+    async def _fetch_deaths(self, report_code, fight_id, semaphore):
+        # Deaths default to friendlies only, bosses need the enemies too
+        results = await asyncio.gather(
+            *[
+                self._fetch_event_pages(
+                    report_code,
+                    fight_id,
+                    f"dataType: Deaths hostilityType: {hostility_type}",
+                    "deaths",
+                    semaphore,
+                )
+                for hostility_type in ("Friendlies", "Enemies")
             ]
+        )
+        deaths = [death for result in results for death in result[0]]
+        return deaths, sum(result[1] for result in results)
+
+    def _get_slice_times(self, fight, start_time=0):
+        """
+        Split the rest of the fight from start_time into num_slices time ranges.
+        The last range is left open so nothing the fight filter would return is cut off
+        """
+        slices_start = max(start_time, fight["startTime"])
+        duration = max(0, fight["endTime"] - slices_start)
+        edges = {
+            slices_start + duration * i // self._num_slices
+            for i in range(1, self._num_slices)
+        }
+        edges = (
+            [start_time]
+            + sorted(edge for edge in edges if edge > start_time)
+            + [100000000000]
+        )
+        return list(zip(edges[:-1], edges[1:]))
+
+    @staticmethod
+    def _stitch_slices(slices):
+        """
+        Join the per-slice events back together. Slice edges are shared, so
+        events on an edge timestamp can be returned by both neighbouring slices
+        """
+        events = []
 
-            if next_page_timestamp == 0:
-                combatant_info = r["combatantInfo"]["data"]
-                deaths = [
-                    death for death in r["deaths"]["data"] if death["type"] == "death"
-                ]
+        for slice_events in slices:
+            if events and slice_events:
+                edge_timestamp = events[-1]["timestamp"]
+                edge_events = []
+                for event in reversed(events):
+                    if event["timestamp"] != edge_timestamp:
+                        break
+                    edge_events.append(event)
+
+                deduplicated = []
+                for event in slice_events:
+                    if event["timestamp"] == edge_timestamp and event in edge_events:
+                        edge_events.remove(event)
+                        continue
+                    deduplicated.append(event)
+                slice_events = deduplicated
+
+            events += slice_events
+
+        # Slices are fetched in order, so this is a no-op unless WCL returned
+        # events outside of the requested range
+        events.sort(key=lambda event: event["timestamp"])
+        return events
+
+    async def _fetch_events(self, report_code, fight_id, source_id, fight_future):
+        """
+        Only needs the fight metadata (awaited from fight_future) to split up
+        the fetch, so this can be started before the metadata has arrived.
+        If it is still in flight, the first page is fetched speculatively
+        """
+        rankings_query = """
+{
+    reportData {
+        report(code: "%(report_code)s") {
+            rankings(
+                playerMetric: dps
+                fightIDs: [%(fight_id)s]
+            )
+        }
+    }
+}
+""" % {
+            "report_code": report_code,
+            "fight_id": fight_id,
+        }
+        source_filters = f"sourceID: {source_id} includeResources: true"
 
-            next_page_timestamp = r["events"]["nextPageTimestamp"]
-            events += r["events"]["data"]
+        rankings_task = asyncio.create_task(
+            self._fetches.run(
+                ("rankings", report_code, fight_id),
+                lambda: self._query(rankings_query, "rankings", timeout=1.5),
+            )
+        )
+        # Coalesced fetches can outlive this query when it is cancelled, so
+        # they are limited by their own semaphore rather than this query's
+        combatant_info_task = asyncio.create_task(
+            self._fetches.run(
+                ("combatant_info", report_code, fight_id),
+                lambda: self._fetch_event_pages(
+                    report_code,
+                    fight_id,
+                    "dataType: CombatantInfo",
+                    "combatant_info",
+                    asyncio.Semaphore(self._max_concurrency),
+                ),
+            )
+        )
+        deaths_task = asyncio.create_task(
+            self._fetches.run(
+                ("deaths", report_code, fight_id),
+                lambda: self._fetch_deaths(
+                    report_code, fight_id, asyncio.Semaphore(self._max_concurrency)
+                ),
+            )
+        )
+        tasks = [rankings_task, combatant_info_task, deaths_task]
+        semaphore = asyncio.Semaphore(self._max_concurrency)
 
-        rankings = []
+        try:
+            with sentry_sdk.start_span(op="fetch", description="events") as span:
+                pages = []
+                num_requests = 0
+                next_page_timestamp = 0
+
+                if not fight_future.done():
+                    page, next_page_timestamp = await self._fetch_events_page(
+                        report_code, fight_id, source_filters, "events", semaphore
+                    )
+                    pages.append(page)
+                    num_requests += 1
+
+                if next_page_timestamp is not None:
+                    fight = await fight_future
+                    results = await asyncio.gather(
+                        *[
+                            self._fetch_event_pages(
+                                report_code,
+                                fight_id,
+                                source_filters,
+                                "events",
+                                semaphore,
+                                start_time,
+                                end_time,
+                            )
+                            for start_time, end_time in self._get_slice_times(
+                                fight, next_page_timestamp
+                            )
+                        ]
+                    )
+                    pages += [result[0] for result in results]
+                    num_requests += sum(result[1] for result in results)
+
+                events = self._stitch_slices(pages)
+                combatant_info, combatant_info_requests = await combatant_info_task
+                deaths, deaths_requests = await deaths_task
+                num_requests += combatant_info_requests + deaths_requests + 1
+                span.set_data("num_requests", num_requests)
+        except BaseException:
+            for task in tasks:
+                _discard_task(task)
+            raise
+
+        logging.info(
+            f"Fetched {len(events)} events in {num_requests} requests"
+            f" ({len(pages)} slices)"
+        )
+
+        # None if the rankings could not be fetched, to avoid caching them
+        rankings = None
 
         try:
             rankings_result = await rankings_task
         except asyncio.exceptions.TimeoutError:
             logging.error("Timeout fetching rankings")
         else:
+            rankings = []
             if (
                 isinstance(rankings_result, dict)
                 and not rankings_result.get("error")
@@ -200,9 +384,8 @@ class WCLClient:
 
         return events, combatant_info, deaths, rankings
 
-    async def _get_zones(self):
-        if not self._zones:
-            encounter_query = """
+    async def _fetch_zones(self):
+        encounter_query = """
     {
         worldData {
             zones {
@@ -214,17 +397,62 @@ class WCLClient:
         }
     }
             """
-            zones = (await self._query(encounter_query, "zones"))["data"]["worldData"][
-                "zones"
-            ]
-            self.__class__._zones = zones
-        return self._zones
+        return (await self._query(encounter_query, "zones"))["data"]["worldData"][
+            "zones"
+        ]
+
+    async def _load_zones(self):
+        """
+        Zones from disk while they're fresh, so cached reports can be served
+        without WCL. The ones on disk are still used if they can't be fetched
+        """
+        cached_zones = await self._read_cache(("zones",))
+        if cached_zones is not None and _zones_ttl(cached_zones) > 0:
+            return cached_zones
 
-    async def query(self, report_id, fight_id, source_id):
-        zones = await self._get_zones()
-        encounters = [encounter for zone in zones for encounter in zone["encounters"]]
+        try:
+            zones = await self._fetch_zones()
+        except Exception:
+            if cached_zones is None:
+                raise
+            logging.exception("Failed to fetch zones, using stale zones")
+            return cached_zones
+
+        zones = dict(zones=zones, fetched_at=time.time())
+        self._write_cache(("zones",), zones)
+        return zones
+
+    async def _get_zones(self):
+        zones = await self._cache.get_or_load(
+            ("zones",), self._load_zones, ttl=_zones_ttl
+        )
+        return zones["zones"]
+
+    async def _load_metadata(self, report_id):
         metadata = await self._fetch_metadata(report_id)
         report_metadata = metadata["reportData"]["report"]
+        if is_report_immutable(report_metadata["endTime"]):
+            self._write_cache(("metadata", report_id), report_metadata)
+        return report_metadata
+
+    async def _get_cached_metadata(self, report_id):
+        """Report metadata from memory or disk, None if it has to be fetched"""
+        key = ("metadata", report_id)
+        report_metadata = self._cache.get(key)
+        if report_metadata is None:
+            report_metadata = await self._read_cache(key)
+            if report_metadata is not None:
+                self._cache.set(key, report_metadata, _metadata_ttl(report_metadata))
+        return report_metadata
+
+    async def _get_metadata(self, report_id):
+        return await self._cache.get_or_load(
+            ("metadata", report_id),
+            lambda: self._load_metadata(report_id),
+            ttl=_metadata_ttl,
+        )
+
+    def _get_source_and_fight(self, report_metadata, fight_id, source_id):
         actors = report_metadata["masterData"]["actors"]
 
         if actors is None:
@@ -251,13 +479,95 @@ class WCLClient:
                 if fight["encounterID"] != 0
             ]
             if boss_fights:
-                fight_id = boss_fights[-1]["id"]
+                fight = boss_fights[-1]
+            else:
+                fight = report_metadata["fights"][-1]
+        else:
+            for fight in report_metadata["fights"]:
+                if fight["id"] == fight_id:
+                    break
             else:
-                fight_id = report_metadata["fights"][-1]["id"]
+                raise Exception("Fight not found")
 
-        events, combatant_info, deaths, rankings = await self._fetch_events(
-            report_id, fight_id, source
+        return source, fight
+
+    async def _read_cache(self, key):
+        if not self._report_cache:
+            return None
+        return await self._report_cache.get_async(key)
+
+    def _write_cache(self, key, value):
+        # Compressing a large fight takes a while, don't hold up the response for it
+        if self._report_cache:
+            self._report_cache.set_in_background(key, value)
+
+    async def query(self, report_id, fight_id, source_id):
+        report_metadata = await self._get_cached_metadata(report_id)
+        cached_metadata = report_metadata is not None
+
+        if cached_metadata:
+            source, fight = self._get_source_and_fight(
+                report_metadata, fight_id, source_id
+            )
+            fight_data = await self._read_cache(
+                ("events", report_id, fight["id"], source_id)
+            )
+            if fight_data is not None:
+                zones = await self._get_zones()
+                return self._create_report(report_metadata, zones, source, **fight_data)
+
+        zones_task = asyncio.create_task(self._get_zones())
+        fight_future = asyncio.get_running_loop().create_future()
+        events_task = None
+        if cached_metadata:
+            fight_future.set_result(fight)
+            events_task = asyncio.create_task(
+                self._fetch_events(report_id, fight["id"], source_id, fight_future)
+            )
+        elif fight_id != -1:
+            # The events only depend on the request, so fetch them while the
+            # metadata is in flight. They're discarded if the metadata is invalid
+            events_task = asyncio.create_task(
+                self._fetch_events(report_id, fight_id, source_id, fight_future)
+            )
+
+        try:
+            if not cached_metadata:
+                report_metadata = await self._get_metadata(report_id)
+                source, fight = self._get_source_and_fight(
+                    report_metadata, fight_id, source_id
+                )
+                fight_future.set_result(fight)
+
+            if events_task is None:
+                events_task = asyncio.create_task(
+                    self._fetch_events(report_id, fight["id"], source_id, fight_future)
+                )
+
+            events, combatant_info, deaths, rankings = await events_task
+            zones = await zones_task
+        except BaseException:
+            fight_future.cancel()
+            _discard_task(zones_task)
+            if events_task:
+                _discard_task(events_task)
+            raise
+
+        fight_data = dict(
+            events=events,
+            combatant_info=combatant_info,
+            deaths=deaths,
+            rankings=rankings,
         )
+        if is_report_immutable(report_metadata["endTime"]) and rankings is not None:
+            self._write_cache(("events", report_id, fight["id"], source_id), fight_data)
+
+        return self._create_report(report_metadata, zones, source, **fight_data)
+
+    def _create_report(
+        self, report_metadata, zones, source, events, combatant_info, deaths, rankings
+    ):
+        encounters = [encounter for zone in zones for encounter in zone["encounters"]]
 
         return Report(
             source,
@@ -266,19 +576,19 @@ class WCLClient:
             rankings,
             combatant_info,
             encounters,
-            actors,
+            report_metadata["masterData"]["actors"],
             report_metadata["masterData"]["abilities"],
             report_metadata["fights"],
             report_metadata["endTime"],
         )
 
     async def _query(self, query, description, timeout=3):
-        session = await self.session()
+        token = await self._get_token()
         with sentry_sdk.start_span(op="http", description=description):
-            r = await session.post(
+            r = await get_session().post(
                 self.base_url,
                 json={"query": query},
-                headers=dict(Authorization=f"Bearer {self._auth}"),
+                headers=dict(Authorization=f"Bearer {token}"),
                 raise_for_status=True,
                 timeout=timeout,
             )
@@ -295,24 +605,89 @@ class WCLClient:
 
         return json
 
-    async def session(self):
-        if not self._auth:
-            with sentry_sdk.start_span(op="http", description="auth"):
-                r = await self._session.post(
-                    "https://www.warcraftlogs.com/oauth/token",
-                    auth=aiohttp.BasicAuth(self._client_id, self._client_secret),
-                    data={"grant_type": "client_credentials"},
-                    raise_for_status=True,
-                )
-            # Set on class, to be re-used (valid for a year, so probably don't have to worry)
-            self.__class__._auth = (await r.json())["access_token"]
-        return self._session
+    async def _fetch_token(self):
+        with sentry_sdk.start_span(op="http", description="auth"):
+            r = await get_session().post(
+                "https://www.warcraftlogs.com/oauth/token",
+                auth=aiohttp.BasicAuth(self._client_id, self._client_secret),
+                data={"grant_type": "client_credentials"},
+                raise_for_status=True,
+            )
+        return await r.json()
+
+    async def _get_token(self):
+        # Shared by all clients with the same credentials, refreshed a bit before it expires
+        token = await self._cache.get_or_load(
+            ("auth", self._client_id),
+            self._fetch_token,
+            ttl=lambda token: token["expires_in"] - 60,
+        )
+        return token["access_token"]
+
+
+_session = None
+_session_loop = None
+
+
+def get_session():
+    """
+    Process-wide session, so connections to WCL are kept alive and re-used
+    across requests (and warm Lambda invocations) instead of reconnecting each time
+    """
+    global _session, _session_loop
+
+    loop = asyncio.get_running_loop()
+    if _session is not None and not _session.closed and _session_loop is loop:
+        return _session
+
+    if _session is not None and not _session.closed:
+        # Created on an event loop that is gone, it can't be closed from this one
+        _session.detach()
+
+    connector = aiohttp.TCPConnector(
+        limit=int(os.environ.get("WCL_POOL_LIMIT", 100)),
+        limit_per_host=int(os.environ.get("WCL_POOL_LIMIT_PER_HOST", 20)),
+        ttl_dns_cache=int(os.environ.get("WCL_DNS_CACHE_TTL", 300)),
+        keepalive_timeout=int(os.environ.get("WCL_KEEPALIVE_TIMEOUT", 30)),
+    )
+    _session = aiohttp.ClientSession(connector=connector)
+    _session_loop = loop
+    return _session
+
+
+async def close_session():
+    global _session, _session_loop
+
+    if _session is not None and not _session.closed:
+        await _session.close()
+    _session = None
+    _session_loop = None
+
+
+_report_cache = None
+
+
+def get_report_cache():
+    global _report_cache
+
+    if _report_cache is None:
+        _report_cache = DiskCache(
+            os.environ.get(
+                "REPORT_CACHE_DIR",
+                os.path.join(tempfile.gettempdir(), "wcl-report-cache"),
+            ),
+            int(os.environ.get("REPORT_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+        )
+    return _report_cache
 
 
 def get_client():
     return WCLClient(
         os.environ["WCL_CLIENT_ID"],
         os.environ["WCL_CLIENT_SECRET"],
+        num_slices=int(os.environ.get("WCL_EVENTS_NUM_SLICES", 4)),
+        max_concurrency=int(os.environ.get("WCL_EVENTS_MAX_CONCURRENCY", 4)),
+        report_cache=get_report_cache(),
     )
 
 
@@ -27,15 +27,15 @@ class EventsTable:
         rune_color = ["red", "red", "turquoise2", "turquoise2", "green", "green"]
         state = ""
 
-        for i, rune in enumerate(runes):
-            r = rune["name"][0]
-            if rune["name"] == "Death" and rune["is_available"]:
+        for i, (name, is_available, regen_time) in enumerate(runes.runes):
+            r = name[0]
+            if name == "Death" and is_available:
                 r = f"[purple]{r}[/purple]"
-            elif rune["is_available"]:
+            elif is_available:
                 r = f"[{rune_color[i]}]{r}[/{rune_color[i]}]"
             else:
                 r = f"[dim]{r}[/dim]"
-            r += f" {rune['regen_time']}"
+            r += f" {regen_time}"
             state += r
         return state
 
@@ -50,10 +50,10 @@ class EventsTable:
     def add_event(self, event):
         notes = []
 
-        time = self._format_timestamp(event["timestamp"])
+        time = self._format_timestamp(event.timestamp)
 
-        if "gcd_offset" in event:
-            offset = event["gcd_offset"]
+        if hasattr(event, "gcd_offset"):
+            offset = event.gcd_offset
             if offset > 2000:
                 offset_color = "red"
             elif offset > 1600:
@@ -62,47 +62,47 @@ class EventsTable:
                 offset_color = "green3"
             offset_pretty = self._format_timestamp(offset, include_minutes=False)
 
-            if event.get("has_gcd"):
+            if getattr(event, "has_gcd", None):
                 time = f"{time} [{offset_color}](+{offset_pretty})[/{offset_color}]"
 
-        ability = event["ability"]
-        if event["ability"] == "Obliterate":
+        ability = event.ability
+        if event.ability == "Obliterate":
             ability = f"[bold]{ability}[/bold]"
-        if event["type"] == "removebuff":
+        if event.type == "removebuff":
             ability = f"[dim]{ability} ends[/dim]"
-        if event["type"] == "applybuff":
+        if event.type == "applybuff":
             ability = f"[dim]{ability} begins[/dim]"
-        if event["type"] == "removedebuff":
+        if event.type == "removedebuff":
             ability = f"[bold grey0 on red]{ability} drops[bold grey0 on red]"
-        if event["ability"] == "Howling Blast":
+        if event.ability == "Howling Blast":
             ability = f"{ability} ({event['num_targets']})"
-        if event.get("bad_howling_blast"):
+        if getattr(event, "bad_howling_blast", None):
             ability = f"[red]{ability}[red]"
             notes.append("[red]BAD_HOWLING_BLAST[/red]")
-        if event.get("consumes_km") or event.get("consumes_rime"):
+        if getattr(event, "consumes_km", None) or getattr(event, "consumes_rime", None):
             ability = f"[blue]{ability}[blue]"
 
-        runic_power = event["runic_power"] // 10
-        if event.get("runic_power_waste"):
-            runic_power_waste = event["runic_power_waste"] // 10
+        runic_power = event.runic_power // 10
+        if getattr(event, "runic_power_waste", None):
+            runic_power_waste = event.runic_power_waste // 10
             runic_power = f"[red]{runic_power} (+{runic_power_waste})[/red]"
         else:
             runic_power = f"{runic_power}"
 
         rune_str = ""
-        if event["runes_before"] and (
-            event.get("rune_cost")
-            or event["ability"] in ("Blood Tap", "Empower Rune Weapon")
+        if event.runes_before and (
+            getattr(event, "rune_cost", None)
+            or event.ability in ("Blood Tap", "Empower Rune Weapon")
         ):
-            rune_str += self._format_rune_state(event["runes_before"])
+            rune_str += self._format_rune_state(event.runes_before)
             rune_str += " -> "
-        rune_str += self._format_rune_state(event["runes"])
+        rune_str += self._format_rune_state(event.runes)
 
-        if event.get("is_miss"):
+        if getattr(event, "is_miss", None):
             notes.append(f"[red]{event['hit_type']}[/red]")
             ability = f"[red]{ability}[/red]"
 
-        if event.get("rune_spend_error"):
+        if getattr(event, "rune_spend_error", None):
             notes.append("RUNE_ERROR")
 
         row = [time, ability, runic_power]
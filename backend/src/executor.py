@@ -0,0 +1,103 @@
+import asyncio
+import contextvars
+import functools
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+
+def _timed_call(fn, *args):
+    return time.time(), fn(*args)
+
+
+class AnalysisExecutor:
+    """
+    Runs CPU bound work outside of the event loop, at most max_workers at once.
+    Anything beyond that waits in the executor's queue, and how long it waited is tracked.
+    Process pools don't work on Lambda (no /dev/shm), so threads are the default
+    """
+
+    def __init__(self, kind="thread", max_workers=2):
+        if kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers)
+        elif kind == "thread":
+            self._executor = ThreadPoolExecutor(
+                max_workers, thread_name_prefix="analysis"
+            )
+        else:
+            raise ValueError(f"Unknown executor kind {kind}")
+
+        self._kind = kind
+        self._max_workers = max_workers
+        self.in_flight = 0
+        self.completed = 0
+        self.max_queue_depth = 0
+        self.total_wait_time = 0
+        self.max_wait_time = 0
+        self.total_run_time = 0
+
+    @property
+    def queue_depth(self):
+        return max(0, self.in_flight - self._max_workers)
+
+    async def run(self, fn, *args):
+        call = functools.partial(_timed_call, fn, *args)
+        if self._kind == "thread":
+            # Keep the context (and with it the sentry span), like asyncio.to_thread
+            call = functools.partial(contextvars.copy_context().run, call)
+
+        submitted_at = time.time()
+        self.in_flight += 1
+        self.max_queue_depth = max(self.max_queue_depth, self.queue_depth)
+        try:
+            started_at, result = await asyncio.get_running_loop().run_in_executor(
+                self._executor, call
+            )
+        finally:
+            self.in_flight -= 1
+
+        wait_time = max(0, started_at - submitted_at)
+        self.completed += 1
+        self.total_wait_time += wait_time
+        self.max_wait_time = max(self.max_wait_time, wait_time)
+        self.total_run_time += time.time() - started_at
+        return result
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+    def stats(self):
+        completed = self.completed or 1
+        return {
+            "kind": self._kind,
+            "max_workers": self._max_workers,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "completed": self.completed,
+            "avg_wait_time": self.total_wait_time / completed,
+            "max_wait_time": self.max_wait_time,
+            "avg_run_time": self.total_run_time / completed,
+        }
+
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+
+    if _executor is None:
+        _executor = AnalysisExecutor(
+            os.environ.get("ANALYSIS_EXECUTOR", "thread"),
+            int(os.environ.get("ANALYSIS_MAX_WORKERS", 2)),
+        )
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+
+    if _executor is not None:
+        _executor.shutdown()
+        _executor = None
@@ -2,4 +2,6 @@ from mangum import Mangum
 
 from api import app
 
-handler = Mangum(app)
+# Mangum runs the lifespan events on every invocation, which would close the
+# shared WCL session. Keep it open so warm invocations re-use its connections
+handler = Mangum(app, lifespan="off")
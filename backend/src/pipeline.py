@@ -0,0 +1,59 @@
+import time
+
+
+class Pipeline:
+    """
+    Runs events through a sequence of stages, either streaming stages that take
+    an iterable of events and yield them back one at a time, or barriers that
+    need the whole list of events at once.
+    Consecutive streaming stages are chained into a single pass over the events.
+    How long every pass took is appended to timings, as (stage names, seconds)
+    """
+
+    def __init__(self, timings=None):
+        self._stages = []
+        self.timings = [] if timings is None else timings
+
+    def stream(self, name, fn):
+        """fn(events) yields the events to pass on, as it goes through them"""
+        self._stages.append((name, fn, False))
+        return self
+
+    def barrier(self, name, fn):
+        """fn(events) takes the list of events and returns the one to pass on"""
+        self._stages.append((name, fn, True))
+        return self
+
+    def _passes(self):
+        stages = []
+
+        for stage in self._stages:
+            if stage[2]:
+                if stages:
+                    yield stages
+                    stages = []
+                yield [stage]
+            else:
+                stages.append(stage)
+
+        if stages:
+            yield stages
+
+    def run(self, events):
+        for stages in self._passes():
+            start = time.perf_counter()
+
+            for _, fn, is_barrier in stages:
+                events = fn(events)
+            if not is_barrier:
+                events = list(events)
+
+            names = "+".join(name for name, _, _ in stages)
+            self.timings.append((names, time.perf_counter() - start))
+
+        return events
+
+
+def format_timings(timings):
+    passes = ", ".join(f"{names} {seconds * 1000:.1f}ms" for names, seconds in timings)
+    return f"{len(timings)} passes: {passes}"
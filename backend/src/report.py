@@ -1,8 +1,13 @@
+import bisect
 import itertools
 import logging
+import sys
+from collections import defaultdict
 from dataclasses import dataclass, field
 from typing import Set
 
+from pipeline import Pipeline
+
 
 @dataclass
 class Encounter:
@@ -61,6 +66,173 @@ SPELL_TRANSLATIONS = {
     63560: "Ghoul Frenzy",
 }
 
+ICON_URL = "https://wow.zamimg.com/images/wow/icons/large/"
+
+# Used instead of what the report says
+ABILITY_NAME_OVERRIDES = {
+    50842: "Pestilence",
+    51271: "Unbreakable Armor",
+    48266: "Blood Presence",
+    48263: "Blood Presence",
+    50475: "Blood Presence",
+    48265: "Unholy Presence",
+    49772: "Unholy Presence",
+    **SPELL_TRANSLATIONS,
+}
+
+ABILITY_ICON_OVERRIDES = {
+    48266: ICON_URL + "spell_deathknight_bloodpresence.jpg",
+    48263: ICON_URL + "spell_deathknight_bloodpresence.jpg",
+    50475: ICON_URL + "spell_deathknight_bloodpresence.jpg",
+    48265: ICON_URL + "spell_deathknight_unholypresence.jpg",
+    49772: ICON_URL + "spell_deathknight_unholypresence.jpg",
+    51271: ICON_URL + "inv_armor_helm_plate_naxxramas_raidwarrior_c_01.jpg",
+    50842: ICON_URL + "spell_shadow_plaguecloud.jpg",
+    60229: ICON_URL + "inv_inscription_tarotgreatness.jpg",
+    63560: ICON_URL + "ability_ghoulfrenzy.jpg",
+}
+
+# Used for abilities the report doesn't have
+WELL_FED_IDS = (57371, 57399, 57079, 65414, 57111, 57356, 57294)
+
+ABILITY_NAME_FALLBACKS = {
+    53748: "Mighty Strength",
+    48470: "Gift of the Wild",
+    53760: "Flask of Endless Rage",
+    53758: "Flask of Stoneblood",
+    25898: "Greater Blessing of Kings",
+    **{ability_id: "Well Fed" for ability_id in WELL_FED_IDS},
+    24383: "Swiftness of Zanza",
+    28878: "Heroic Presence",
+    6562: "Heroic Presence",
+    393387: "Leader of the Pack",
+    24932: "Leader of the Pack",
+    53762: "Indestructible",
+}
+
+ABILITY_ICON_FALLBACKS = {
+    53748: ICON_URL + "inv_potion_165.jpg",
+    48470: ICON_URL + "spell_nature_giftofthewild.jpg",
+    53760: ICON_URL + "inv_alchemy_endlessflask_06.jpg",
+    53758: ICON_URL + "inv_alchemy_endlessflask_05.jpg",
+    25898: ICON_URL + "spell_magic_greaterblessingofkings.jpg",
+    **{ability_id: ICON_URL + "spell_misc_food.jpg" for ability_id in WELL_FED_IDS},
+    24383: ICON_URL + "inv_potion_31.jpg",
+    28878: ICON_URL + "inv_helmet_21.jpg",
+    6562: ICON_URL + "inv_helmet_21.jpg",
+    393387: ICON_URL + "spell_nature_unyeildingstamina.jpg",
+    24932: ICON_URL + "spell_nature_unyeildingstamina.jpg",
+    53762: ICON_URL + "inv_alchemy_elixir_empty.jpg",
+}
+
+
+class Event:
+    """
+    A normalized event. Events are by far the most numerous objects, so they have
+    fixed fields instead of being dicts. The fight and the analyzers use the
+    fields as attributes, with getattr() for the fields that are not always set.
+    Events can still be used like a dict, where fields that are not set behave
+    like missing keys, but that goes through Python level methods
+    """
+
+    # The raw WCL fields that are still used after normalization, the rest is dropped
+    RAW_FIELDS = (
+        "timestamp",
+        "type",
+        "fight",
+        "sourceID",
+        "sourceInstance",
+        "targetID",
+        "abilityGameID",
+        "hitType",
+        "amount",
+        "overkill",
+        "hitPoints",
+        "maxHitPoints",
+        "resourceChangeType",
+    )
+
+    __slots__ = RAW_FIELDS + (
+        # Added during normalization
+        "ability",
+        "ability_icon",
+        "ability_type",
+        "source",
+        "source_is_boss",
+        "target",
+        "target_is_boss",
+        "target_dies_at",
+        "is_miss",
+        "is_crit",
+        "hit_type",
+        "num_targets",
+        "rune_cost",
+        "runes_used",
+        "modifies_runes",
+        "runic_power",
+        "runic_power_cost",
+        "runic_power_waste",
+        "runic_power_gained_ams",
+        "is_owner_pet_source",
+        "is_owner_pet_target",
+        "consumes_km",
+        "consumes_rime",
+        # Added by the analyzers
+        "buffs",
+        "in_dead_zone",
+        "recent_dead_zone",
+        "runes",
+        "runes_before",
+        "rune_spend_error",
+        "rune_grace_wasted",
+        "has_gcd",
+        "gcd_offset",
+        "is_core_cast",
+        "bad_howling_blast",
+    )
+
+    def __init__(self, **fields):
+        for key, value in fields.items():
+            setattr(self, key, value)
+
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in EVENT_FIELDS and hasattr(self, key)
+
+    def get(self, key, default=None):
+        if key not in EVENT_FIELDS:
+            return default
+        return getattr(self, key, default)
+
+    def update(self, **fields):
+        for key, value in fields.items():
+            setattr(self, key, value)
+
+    def to_dict(self):
+        fields = {
+            key: getattr(self, key) for key in self.__slots__ if hasattr(self, key)
+        }
+        for key in SNAPSHOT_FIELDS:
+            if fields.get(key) is not None:
+                fields[key] = fields[key].serialize()
+        return fields
+
+    def __repr__(self):
+        return f"Event({self.to_dict()})"
+
+
+EVENT_FIELDS = frozenset(Event.__slots__)
+# Fields holding snapshots shared between events, expanded when serialized
+SNAPSHOT_FIELDS = ("runes", "runes_before")
+
 
 class Report:
     def __init__(
@@ -77,16 +249,20 @@ class Report:
         end_time,
     ):
         self.source = source
-        self._events = events
-        self._deaths = {death["targetID"]: death for death in deaths}
-        self._rankings = self._parse_rankings(rankings)
-        self._combatant_info = combatant_info
+        # Partitioned once, so getting a fight doesn't go through every event
+        self._events_by_fight = self._partition_by_fight(events)
+        self._deaths = {death["targetID"]: death["timestamp"] for death in deaths}
+        # None if the rankings couldn't be fetched
+        self.has_rankings = rankings is not None
+        self._rankings = self._parse_rankings(rankings or [])
+        self._combatant_info_by_fight = self._partition_by_fight(combatant_info)
         self._encounters = {
             encounter["id"]: Encounter(encounter["id"], encounter["name"])
             for encounter in encounters
         }
         self._actors = {actor["id"]: actor for actor in actors}
-        self._abilities = abilities
+        self._actor_names = {actor["id"]: sys.intern(actor["name"]) for actor in actors}
+        self._abilities = self._build_ability_table(abilities)
         self._fights = {fight["id"]: fight for fight in fights}
         self.end_time = end_time
 
@@ -96,6 +272,29 @@ class Report:
         else:
             self._last_fight = fights[-1]
 
+    @staticmethod
+    def _partition_by_fight(events):
+        events_by_fight = defaultdict(list)
+        for event in events:
+            events_by_fight[event["fight"]].append(event)
+        return events_by_fight
+
+    def _build_ability_table(self, abilities):
+        """gameID -> (name, icon, type) of the report's abilities, with the overrides applied"""
+        table = {}
+
+        for ability in abilities:
+            ability_id = ability["gameID"]
+            if ability_id in table:
+                continue
+            table[ability_id] = (
+                sys.intern(ABILITY_NAME_OVERRIDES.get(ability_id, ability["name"])),
+                ABILITY_ICON_OVERRIDES.get(ability_id, ICON_URL + ability["icon"]),
+                ability["type"],
+            )
+
+        return table
+
     def _parse_rankings(self, rankings):
         ret = {}
 
@@ -124,11 +323,12 @@ class Report:
         return ret
 
     def get_fight(self, fight_id):
+        """Each fight can be got once, its raw events are handed over to it"""
         if fight_id == -1:
             fight_id = self._last_fight["id"]
 
         fight = self._fights[fight_id]
-        combatant_info = [c for c in self._combatant_info if c["fight"] == fight["id"]]
+        combatant_info = self._combatant_info_by_fight.get(fight["id"], [])
 
         fight_rankings = self._rankings.get(fight["id"], {})
         for player_ranking in fight_rankings.get("player_rankings", []):
@@ -150,14 +350,15 @@ class Report:
             encounter,
             fight["startTime"],
             fight["endTime"],
-            [event for event in self._events if fight["id"] == event["fight"]],
+            # Handed over, so they're freed as they're normalized
+            self._events_by_fight.pop(fight["id"], []),
             fight_rankings,
             combatant_info,
             fight["hardModeLevel"],
         )
 
     def get_actor_name(self, actor_id: int):
-        return self._actors[actor_id]["name"]
+        return self._actor_names[actor_id]
 
     def is_owner_pet(self, actor_id: int):
         return actor_id in self.source.pets
@@ -166,106 +367,48 @@ class Report:
         return self._actors[actor_id]["subType"] == "Boss"
 
     def get_target_death(self, actor_id: int):
-        return self._deaths.get(actor_id, {}).get("timestamp")
+        return self._deaths.get(actor_id)
+
+    def get_ability(self, ability_id: int):
+        """(name, icon, type) of an ability"""
+        ability = self._abilities.get(ability_id)
+        if ability is None:
+            # Raises, every ability in an event should be in the report
+            return (
+                self.get_ability_name(ability_id),
+                self.get_ability_icon(ability_id),
+                self.get_ability_type(ability_id),
+            )
+
+        name, icon, ability_type = ability
+        return name, icon, int(ability_type)
 
     def get_ability_name(self, ability_id: int):
-        if ability_id in SPELL_TRANSLATIONS:
-            return SPELL_TRANSLATIONS[ability_id]
-
-        if ability_id == 50842:
-            return "Pestilence"
-        if ability_id == 51271:
-            return "Unbreakable Armor"
-        if ability_id in (48266, 48263, 50475):
-            return "Blood Presence"
-        if ability_id in (48265, 49772):
-            return "Unholy Presence"
-        if ability_id == 48263:
-            return "Frost Presence"
-        for ability in self._abilities:
-            if ability["gameID"] == ability_id:
-                return ability["name"]
-        else:
-            if ability_id == 53748:
-                return "Mighty Strength"
-            if ability_id == 48470:
-                return "Gift of the Wild"
-            if ability_id == 53760:
-                return "Flask of Endless Rage"
-            if ability_id == 53758:
-                return "Flask of Stoneblood"
-            if ability_id == 25898:
-                return "Greater Blessing of Kings"
-            if ability_id in (57371, 57399, 57079, 65414, 57111, 57356, 57294):
-                return "Well Fed"
-            if ability_id == 24383:
-                return "Swiftness of Zanza"
-            if ability_id in (28878, 6562):
-                return "Heroic Presence"
-            if ability_id in (393387, 24932):
-                return "Leader of the Pack"
-            if ability_id == 53762:
-                return "Indestructible"
-            logging.warning(f"No ability name found for id: {ability_id}")
-            return "Unknown"
+        if ability_id in self._abilities:
+            return self._abilities[ability_id][0]
+        if ability_id in ABILITY_NAME_OVERRIDES:
+            return ABILITY_NAME_OVERRIDES[ability_id]
+        if ability_id in ABILITY_NAME_FALLBACKS:
+            return ABILITY_NAME_FALLBACKS[ability_id]
+
+        logging.warning(f"No ability name found for id: {ability_id}")
+        return "Unknown"
 
     def get_ability_icon(self, ability_id: int):
-        if ability_id in (48266, 48263, 50475):
-            return "https://wow.zamimg.com/images/wow/icons/large/spell_deathknight_bloodpresence.jpg"
-        if ability_id in (48265, 49772):
-            return "https://wow.zamimg.com/images/wow/icons/large/spell_deathknight_unholypresence.jpg"
-        if ability_id == 48263:
-            return "https://wow.zamimg.com/images/wow/icons/large/spell_deathknight_frostpresence.jpg"
-        if ability_id == 51271:
-            return "https://wow.zamimg.com/images/wow/icons/large/inv_armor_helm_plate_naxxramas_raidwarrior_c_01.jpg"
-        if ability_id == 50842:
-            return "https://wow.zamimg.com/images/wow/icons/large/spell_shadow_plaguecloud.jpg"
-        if ability_id == 60229:
-            return "https://wow.zamimg.com/images/wow/icons/large/inv_inscription_tarotgreatness.jpg"
-        if ability_id == 63560:
-            return (
-                "https://wow.zamimg.com/images/wow/icons/large/ability_ghoulfrenzy.jpg"
-            )
+        if ability_id in self._abilities:
+            return self._abilities[ability_id][1]
+        if ability_id in ABILITY_ICON_OVERRIDES:
+            return ABILITY_ICON_OVERRIDES[ability_id]
+        if ability_id in ABILITY_ICON_FALLBACKS:
+            return ABILITY_ICON_FALLBACKS[ability_id]
 
-        for ability in self._abilities:
-            if ability["gameID"] == ability_id:
-                return (
-                    f'https://wow.zamimg.com/images/wow/icons/large/{ability["icon"]}'
-                )
-        else:
-            if ability_id == 53748:
-                return (
-                    "https://wow.zamimg.com/images/wow/icons/large/inv_potion_165.jpg"
-                )
-            if ability_id == 48470:
-                return "https://wow.zamimg.com/images/wow/icons/large/spell_nature_giftofthewild.jpg"
-            if ability_id == 53760:
-                return "https://wow.zamimg.com/images/wow/icons/large/inv_alchemy_endlessflask_06.jpg"
-            if ability_id == 53758:
-                return "https://wow.zamimg.com/images/wow/icons/large/inv_alchemy_endlessflask_05.jpg"
-            if ability_id == 25898:
-                return "https://wow.zamimg.com/images/wow/icons/large/spell_magic_greaterblessingofkings.jpg"
-            if ability_id in (57371, 57399, 57079, 65414, 57111, 57356, 57294):
-                return (
-                    "https://wow.zamimg.com/images/wow/icons/large/spell_misc_food.jpg"
-                )
-            if ability_id == 24383:
-                return "https://wow.zamimg.com/images/wow/icons/large/inv_potion_31.jpg"
-            if ability_id in (28878, 6562):
-                return "https://wow.zamimg.com/images/wow/icons/large/inv_helmet_21.jpg"
-            if ability_id in (393387, 24932):
-                return "https://wow.zamimg.com/images/wow/icons/large/spell_nature_unyeildingstamina.jpg"
-            if ability_id == 53762:
-                return "https://wow.zamimg.com/images/wow/icons/large/inv_alchemy_elixir_empty.jpg"
-            logging.warning(f"No ability icon found for id: {ability_id}")
-            return "https://wow.zamimg.com/images/wow/icons/large/trade_engineering.jpg"
+        logging.warning(f"No ability icon found for id: {ability_id}")
+        return ICON_URL + "trade_engineering.jpg"
 
     def get_ability_type(self, ability_id: int):
-        for ability in self._abilities:
-            if ability["gameID"] == ability_id:
-                return int(ability["type"])
-        else:
-            raise Exception(f"No ability type found for id: {ability_id}")
+        if ability_id in self._abilities:
+            return int(self._abilities[ability_id][2])
+        raise Exception(f"No ability type found for id: {ability_id}")
 
 
 class Fight:
@@ -293,14 +436,19 @@ class Fight:
         self.rankings = rankings
         self._hard_mode_level = hard_mode_level
 
-        self.events = [self._normalize_event(event) for event in events]
-        self._fix_cotg()
-        self._add_rp()
-        self.events = self._coalesce()
-        self._add_proc_consumption()
-
+        # (stage names, seconds) of the passes over the events
+        self.timings = []
+        pipeline = (
+            Pipeline(self.timings)
+            .stream("normalize", self._normalize_events)
+            .stream("fix_cotg", self._fix_cotg)
+            .stream("add_rp", self._add_rp)
+            .barrier("coalesce", self._coalesce)
+            .stream("add_proc_consumption", self._add_proc_consumption)
+        )
         if encounter.name == "Razorscale":
-            self.events = self._fix_razorscale()
+            pipeline.barrier("fix_razorscale", self._fix_razorscale)
+        self.events = pipeline.run(events)
 
     @property
     def source(self):
@@ -317,37 +465,47 @@ class Fight:
         if source_id not in self._combatant_info_lookup:
             return {}
 
+        # The raw combatant info is shared with concurrent queries for the
+        # fight and may still be being written to the cache, so annotate a copy
         combatant_info = self._combatant_info_lookup[source_id]
-        for aura in combatant_info["auras"]:
-            aura["name"] = self._report.get_ability_name(aura["ability"])
-            aura["ability_icon"] = self._report.get_ability_icon(aura["ability"])
-
-        for gear in combatant_info["gear"]:
-            gear[
-                "item_icon"
-            ] = f"https://wow.zamimg.com/images/wow/icons/large/{gear['icon']}"
-
-        return combatant_info
+        return {
+            **combatant_info,
+            "auras": [
+                {
+                    **aura,
+                    "name": self._report.get_ability_name(aura["ability"]),
+                    "ability_icon": self._report.get_ability_icon(aura["ability"]),
+                }
+                for aura in combatant_info["auras"]
+            ],
+            "gear": [
+                {
+                    **gear,
+                    "item_icon": f"https://wow.zamimg.com/images/wow/icons/large/{gear['icon']}",
+                }
+                for gear in combatant_info["gear"]
+            ],
+        }
 
-    def _fix_razorscale(self):
-        for event in self.events:
-            if event.get("target") == "Razorscale":
-                first_razorscale_event = event["timestamp"]
+    def _fix_razorscale(self, events):
+        for event in events:
+            if getattr(event, "target", None) == "Razorscale":
+                first_razorscale_event = event.timestamp
                 break
         else:
             return []
 
         filtered_events = []
 
-        for event in self.events:
-            if event["timestamp"] >= first_razorscale_event:
-                event["timestamp"] -= first_razorscale_event
+        for event in events:
+            if event.timestamp >= first_razorscale_event:
+                event.timestamp -= first_razorscale_event
                 filtered_events.append(event)
-        self.duration = filtered_events[-1]["timestamp"]
+        self.duration = filtered_events[-1].timestamp
 
         return filtered_events
 
-    def _add_proc_consumption(self):
+    def _add_proc_consumption(self, events):
         auras = self.get_combatant_info(self.source.id).get("auras", [])
         has_rime = False
         has_km = False
@@ -359,160 +517,193 @@ class Fight:
             elif name == "Killing Machine":
                 has_km = True
 
-        for event in self.events:
-            if event["type"] in ("applybuff", "refreshbuff", "removebuff"):
-                if event["ability"] == "Rime":
-                    has_rime = event["type"] != "removebuff"
-                if event["ability"] == "Killing Machine":
-                    has_km = event["type"] != "removebuff"
+        for event in events:
+            if event.type in ("applybuff", "refreshbuff", "removebuff"):
+                if event.ability == "Rime":
+                    has_rime = event.type != "removebuff"
+                if event.ability == "Killing Machine":
+                    has_km = event.type != "removebuff"
 
-            if event["type"] == "cast":
-                event["consumes_km"] = False
-                event["consumes_rime"] = False
+            if event.type == "cast":
+                event.consumes_km = False
+                event.consumes_rime = False
 
-            if event["type"] == "cast" and event["ability"] in (
+            if event.type == "cast" and event.ability in (
                 "Frost Strike",
                 "Howling Blast",
             ):
-                if has_rime and event["ability"] == "Howling Blast":
-                    event["consumes_rime"] = True
+                if has_rime and event.ability == "Howling Blast":
+                    event.consumes_rime = True
                 if has_km:
-                    event["consumes_km"] = True
+                    event.consumes_km = True
+
+            yield event
 
-    def _fix_cotg(self):
+    def _fix_cotg(self, events):
         """
         WOW combat log is not correctly emitting events for curse of the grave
         the advanced combat log eventually (after a few events, usually) updates
         to correctly have the new RP.
         :return:
         """
-        stated_rp = None
+        # (timestamp, stated RP) of the Obliterates whose RP is still being corrected
+        pending = []
 
         def _update_waste(event):
-            if "runic_power_waste" not in event:
-                event["runic_power_waste"] = 0
-
-            event["runic_power_waste"] += max(0, event["runic_power"] - 1300)
-            event["runic_power"] = min(1300, event["runic_power"])
+            event.runic_power_waste = getattr(event, "runic_power_waste", 0) + max(
+                0, event.runic_power - 1300
+            )
+            event.runic_power = min(1300, event.runic_power)
+
+        for event in events:
+            if pending:
+                # Need a higher threshold here, it can take a while
+                pending = [
+                    (timestamp, stated_rp)
+                    for timestamp, stated_rp in pending
+                    if event.timestamp - timestamp <= 500
+                ]
+
+            for _, stated_rp in pending:
+                if getattr(event, "runic_power", None) == stated_rp:
+                    event.runic_power += 50
+                    # Only add to the waste if it's not already over cap
+                    if event.type == "resourcechange" and not getattr(
+                        event, "runic_power_waste", None
+                    ):
+                        event.runic_power_waste = max(0, event.runic_power - 1300)
+                    event.runic_power = min(1300, event.runic_power)
 
-        for i, event in enumerate(self.events):
             if (
-                event["type"] == "resourcechange"
-                and event["ability"] == "Obliterate"
-                and event["resourceChangeType"] == 6
+                event.type == "resourcechange"
+                and event.ability == "Obliterate"
+                and event.resourceChangeType == 6
             ):
-                stated_rp = event["runic_power"]
-                event["runic_power"] += 50
+                pending.append((event.timestamp, event.runic_power))
+                event.runic_power += 50
                 _update_waste(event)
 
-                for next_event in self.events[i + 1 :]:  # noqa
-                    # Need a higher threshold here, it can take a while
-                    if next_event["timestamp"] - event["timestamp"] > 500:
-                        break
+            yield event
 
-                    if "runic_power" in event:
-                        if next_event.get("runic_power") == stated_rp:
-                            next_event["runic_power"] += 50
-                            # Only add to the waste if it's not already over cap
-                            if next_event[
-                                "type"
-                            ] == "resourcechange" and not next_event.get(
-                                "runic_power_waste"
-                            ):
-                                next_event["runic_power_waste"] = max(
-                                    0, next_event["runic_power"] - 1300
-                                )
-                            next_event["runic_power"] = min(
-                                1300, next_event["runic_power"]
-                            )
-
-    def _add_rp(self):
+    def _add_rp(self, events):
         last_event = None
 
-        for event in self.events:
-            if not event.get("runic_power"):
-                runic_power = last_event["runic_power"] if last_event else 0
-                event["runic_power"] = runic_power
+        for event in events:
+            if not getattr(event, "runic_power", None):
+                event.runic_power = last_event.runic_power if last_event else 0
             last_event = event
+            yield event
 
-    def _coalesce(self):
+    def _coalesce(self, events):
         """
         Merge multiple events into each other in two cases:
         - Damage events to their respective cast event to detect misses
         - RP events to their respective cast event to track RP gains / losses
         """
-        events = []
+        coalesced_events = []
+        num_events = len(events)
+
+        # The lookaheads below can stop at their time horizon, as long as the
+        # events are in order (they should always be, but don't rely on it)
+        is_sorted = all(
+            events[i].timestamp <= events[i + 1].timestamp
+            for i in range(num_events - 1)
+        )
 
-        for i, event in enumerate(self.events):
+        # Damage events by what they are matched on, in order
+        damage_events = defaultdict(list)
+        for i, event in enumerate(events):
+            if event.type == "damage":
+                key = (event.abilityGameID, getattr(event, "sourceInstance", None))
+                damage_events[key].append(i)
+
+        # Index of the next event with a different RP than the event at i
+        next_rp_change = [num_events] * num_events
+        for i in range(num_events - 2, -1, -1):
+            if events[i + 1].runic_power != events[i].runic_power:
+                next_rp_change[i] = i + 1
+            else:
+                next_rp_change[i] = next_rp_change[i + 1]
+
+        for i, event in enumerate(events):
             extra = {}
 
-            if event["type"] == "cast":
+            if event.type == "cast":
                 # Check if we're actually hitting a target
-                if event["targetID"] != -1:
-                    event["num_targets"] = 1
+                if event.targetID != -1:
+                    event.num_targets = 1
                     # Go through subsequent events to coalesce miss into this event
-                    for next_event in self.events[i + 1 :]:  # noqa
-                        if (
-                            next_event["type"] == "damage"
-                            and next_event["abilityGameID"] == event["abilityGameID"]
-                            and abs(next_event["timestamp"] - event["timestamp"]) < 100
-                            and next_event.get("sourceInstance")
-                            == event.get("sourceInstance")
-                        ):
-                            if event["targetID"] != next_event["targetID"]:
-                                event["num_targets"] += 1
-                            else:  # only show misses on same target
-                                is_miss = next_event["is_miss"]
-                                hit_type = next_event["hitType"]
-                                extra.update(is_miss=is_miss, hit_type=hit_type)
+                    indices = damage_events.get(
+                        (event.abilityGameID, getattr(event, "sourceInstance", None)),
+                        [],
+                    )
+                    for j in indices[bisect.bisect_right(indices, i) :]:  # noqa
+                        next_event = events[j]
+                        if abs(next_event.timestamp - event.timestamp) >= 100:
+                            if is_sorted:
+                                break
+                            continue
+
+                        if event.targetID != next_event.targetID:
+                            event.num_targets += 1
+                        else:  # only show misses on same target
+                            is_miss = next_event.is_miss
+                            hit_type = next_event.hitType
+                            extra.update(is_miss=is_miss, hit_type=hit_type)
                     if "is_miss" not in extra:
                         extra.update(is_miss=False, hit_type="NO_DAMAGE_EVENT")
 
                 # Go through subsequent events to coalesce RP into this event
-                for next_event in self.events[i + 1 :]:  # noqa
-                    if next_event["timestamp"] - event["timestamp"] > 900:
+                for j in range(i + 1, num_events):
+                    next_event = events[j]
+                    if next_event.timestamp - event.timestamp > 900:
                         break
 
-                    if next_event["runic_power"] != event["runic_power"]:
-                        if next_event["runic_power"] < event["runic_power"]:
+                    if next_event.runic_power != event.runic_power:
+                        if next_event.runic_power < event.runic_power:
                             break
 
                         # We want to get the last change event of the group
-                        event["runic_power"] = next_event["runic_power"]
+                        event.runic_power = next_event.runic_power
 
                 # Coalesce runic_power_waste
-                for next_event in self.events[i + 1 :]:  # noqa
-                    if next_event["timestamp"] - event["timestamp"] > 900:
+                for j in range(i + 1, num_events):
+                    next_event = events[j]
+                    if next_event.timestamp - event.timestamp > 900:
                         break
 
-                    if next_event.get("runic_power_waste") and (
-                        next_event["abilityGameID"] == event["abilityGameID"]
+                    if getattr(next_event, "runic_power_waste", None) and (
+                        next_event.abilityGameID == event.abilityGameID
                         or (
-                            event["ability"] == "Obliterate"
-                            and next_event["ability"] == "Fingers of the Damned"
+                            event.ability == "Obliterate"
+                            and next_event.ability == "Fingers of the Damned"
                         )
                     ):
-                        event["runic_power_waste"] = (
-                            event.get("runic_power_waste", 0)
-                            + next_event["runic_power_waste"]
+                        event.runic_power_waste = (
+                            getattr(event, "runic_power_waste", 0)
+                            + next_event.runic_power_waste
                         )
 
                 # Spells like frost strike don't seem to immediately use the RP
-                if event.get("runic_power_cost", 0) > 0:
-                    for next_event in self.events[i + 1 :]:  # noqa
-                        if next_event["runic_power"] != event["runic_power"]:
-                            if next_event["runic_power"] > event["runic_power"]:
-                                break
-                            event["runic_power"] = next_event["runic_power"]
-                            break
+                if getattr(event, "runic_power_cost", 0) > 0 and i + 1 < num_events:
+                    # The first event after this one with a different RP, the
+                    # events up to next_rp_change all have the same RP
+                    j = i + 1
+                    if events[j].runic_power == event.runic_power:
+                        j = next_rp_change[j]
+
+                    if j < num_events:
+                        next_event = events[j]
+                        if next_event.runic_power < event.runic_power:
+                            event.runic_power = next_event.runic_power
 
                 event.update(
-                    runic_power_waste=event.get("runic_power_waste", 0),
-                    num_targets=event.get("num_targets", 0),
+                    runic_power_waste=getattr(event, "runic_power_waste", 0),
+                    num_targets=getattr(event, "num_targets", 0),
                     **extra,
                 )
-            events.append(event)
-        return events
+            coalesced_events.append(event)
+        return coalesced_events
 
     def _normalize_time(self, timestamp):
         if timestamp:
@@ -524,101 +715,102 @@ class Fight:
         frost_type = 21
         unholy_type = 22
 
-        if normalized_event["ability"] == "Obliterate":
+        if normalized_event.ability == "Obliterate":
             frost_type = 22
             unholy_type = 21
 
         return {"frost": frost_type, "unholy": unholy_type}
 
+    def _normalize_events(self, events):
+        # Takes the raw events out of the list as it goes, rather than keeping
+        # every raw event alive along with its normalized Event
+        events.reverse()
+        while events:
+            yield self._normalize_event(events.pop())
+
     def _normalize_event(self, event):
-        normalized_event = {**event}
-        normalized_event["timestamp"] = self._normalize_time(event["timestamp"])
+        # Events are set up through their attributes here, see Event
+        normalized_event = Event(
+            **{key: event[key] for key in Event.RAW_FIELDS if key in event}
+        )
+        normalized_event.timestamp = self._normalize_time(event["timestamp"])
+        # Like ability and actor names, interned so the analyzers' checks against
+        # literals and name_set()s mostly come down to identity comparisons
+        normalized_event.type = sys.intern(event["type"])
 
         if "abilityGameID" in event:
-            normalized_event["ability_icon"] = (
-                self._report.get_ability_icon(event["abilityGameID"]),
-            )
-            normalized_event["ability_type"] = self._report.get_ability_type(
-                event["abilityGameID"]
-            )
-            normalized_event["ability"] = self._report.get_ability_name(
+            ability_name, ability_icon, ability_type = self._report.get_ability(
                 event["abilityGameID"]
             )
+            normalized_event.ability_icon = (ability_icon,)
+            normalized_event.ability_type = ability_type
+            normalized_event.ability = ability_name
         if "sourceID" in event:
-            normalized_event["source"] = self._report.get_actor_name(
-                normalized_event["sourceID"]
-            )
-            normalized_event["source_is_boss"] = self._report.get_is_boss_actor(
-                normalized_event["sourceID"]
-            )
+            source_id = event["sourceID"]
+            normalized_event.source = self._report.get_actor_name(source_id)
+            normalized_event.source_is_boss = self._report.get_is_boss_actor(source_id)
         if "targetID" in event:
-            normalized_event["target"] = self._report.get_actor_name(
-                normalized_event["targetID"]
-            )
-            normalized_event["target_is_boss"] = self._report.get_is_boss_actor(
-                normalized_event["targetID"]
-            )
-            normalized_event["target_dies_at"] = self._normalize_time(
-                self._report.get_target_death(normalized_event["targetID"])
+            target_id = event["targetID"]
+            normalized_event.target = self._report.get_actor_name(target_id)
+            normalized_event.target_is_boss = self._report.get_is_boss_actor(target_id)
+            normalized_event.target_dies_at = self._normalize_time(
+                self._report.get_target_death(target_id)
             )
         if "hitType" in event:
-            normalized_event["hitType"] = HIT_TYPES[event["hitType"]]
-            normalized_event["is_miss"] = normalized_event["hitType"] in MISS_EVENTS
-            normalized_event["is_crit"] = normalized_event["hitType"] in CRIT_EVENTS
+            hit_type = HIT_TYPES[event["hitType"]]
+            normalized_event.hitType = hit_type
+            normalized_event.is_miss = hit_type in MISS_EVENTS
+            normalized_event.is_crit = hit_type in CRIT_EVENTS
+
+        rune_cost = None
         if event["type"] == "cast":
-            normalized_event["rune_cost"] = {**NO_RUNES}
-            normalized_event["runes_used"] = {**NO_RUNES}
+            rune_cost = {**NO_RUNES}
+            normalized_event.rune_cost = rune_cost
+            normalized_event.runes_used = {**NO_RUNES}
         if "classResources" in event:
             rune_resource_types = self._get_rune_resource_types(normalized_event)
+            runes_used = getattr(normalized_event, "runes_used", None)
 
             for resource in event["classResources"]:
                 if resource["type"] == 6:
-                    normalized_event["runic_power"] = resource["amount"]
+                    normalized_event.runic_power = resource["amount"]
                     if resource.get("cost"):
-                        normalized_event["runic_power_cost"] = resource["cost"]
+                        normalized_event.runic_power_cost = resource["cost"]
                 if resource["type"] == 20:
-                    normalized_event["rune_cost"]["blood"] += resource["cost"]
-                    normalized_event["runes_used"]["blood"] += min(
-                        resource["amount"], resource["cost"]
-                    )
+                    rune_cost["blood"] += resource["cost"]
+                    runes_used["blood"] += min(resource["amount"], resource["cost"])
                 if resource["type"] == rune_resource_types["frost"]:
-                    normalized_event["rune_cost"]["frost"] += resource["cost"]
-                    normalized_event["runes_used"]["frost"] += min(
-                        resource["amount"], resource["cost"]
-                    )
+                    rune_cost["frost"] += resource["cost"]
+                    runes_used["frost"] += min(resource["amount"], resource["cost"])
                 if resource["type"] == rune_resource_types["unholy"]:
-                    normalized_event["rune_cost"]["unholy"] += resource["cost"]
-                    normalized_event["runes_used"]["unholy"] += min(
-                        resource["amount"], resource["cost"]
-                    )
-            if normalized_event.get("rune_cost") == NO_RUNES:
-                normalized_event["rune_cost"] = None
+                    rune_cost["unholy"] += resource["cost"]
+                    runes_used["unholy"] += min(resource["amount"], resource["cost"])
+            if rune_cost == NO_RUNES:
+                rune_cost = None
+                normalized_event.rune_cost = None
 
-        normalized_event["modifies_runes"] = False
-        if normalized_event.get("rune_cost") or normalized_event.get("ability") in (
-            "Blood Tap",
-            "Empower Rune Weapon",
-        ):
-            normalized_event["modifies_runes"] = True
+        normalized_event.modifies_runes = bool(rune_cost) or getattr(
+            normalized_event, "ability", None
+        ) in ("Blood Tap", "Empower Rune Weapon")
 
         if "waste" in event and event["resourceChangeType"] == 6:
-            normalized_event["runic_power_waste"] = event["waste"] * 10
+            normalized_event.runic_power_waste = event["waste"] * 10
 
         if (
-            normalized_event["type"] == "resourcechange"
-            and normalized_event["ability"] == "Anti-Magic Shell"
+            normalized_event.type == "resourcechange"
+            and normalized_event.ability == "Anti-Magic Shell"
         ):
             runic_power_gain = event["resourceChange"] - event["waste"]
-            normalized_event["runic_power_gained_ams"] = runic_power_gain * 10
+            normalized_event.runic_power_gained_ams = runic_power_gain * 10
 
         if "sourceID" in event:
-            normalized_event["is_owner_pet_source"] = self._report.is_owner_pet(
-                normalized_event["sourceID"]
+            normalized_event.is_owner_pet_source = self._report.is_owner_pet(
+                event["sourceID"]
             )
-        normalized_event["is_owner_pet_target"] = False
-        if normalized_event.get("targetID"):
-            normalized_event["is_owner_pet_target"] = self._report.is_owner_pet(
-                normalized_event["targetID"]
+        normalized_event.is_owner_pet_target = False
+        if event.get("targetID"):
+            normalized_event.is_owner_pet_target = self._report.is_owner_pet(
+                event["targetID"]
             )
 
         return normalized_event
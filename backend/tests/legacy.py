@@ -0,0 +1,451 @@
+"""
+Previous implementations of code that has been rewritten for speed, kept as the
+reference the rewrites are tested and benchmarked against
+"""
+
+
+def fix_cotg_sliced(events):
+    """
+    Fight._fix_cotg as a pass over the full list of events, looking ahead
+    through a copy of the rest of the events for every Obliterate
+    """
+    stated_rp = None
+
+    def _update_waste(event):
+        if "runic_power_waste" not in event:
+            event["runic_power_waste"] = 0
+
+        event["runic_power_waste"] += max(0, event["runic_power"] - 1300)
+        event["runic_power"] = min(1300, event["runic_power"])
+
+    for i, event in enumerate(events):
+        if (
+            event["type"] == "resourcechange"
+            and event["ability"] == "Obliterate"
+            and event["resourceChangeType"] == 6
+        ):
+            stated_rp = event["runic_power"]
+            event["runic_power"] += 50
+            _update_waste(event)
+
+            for next_event in events[i + 1 :]:  # noqa
+                # Need a higher threshold here, it can take a while
+                if next_event["timestamp"] - event["timestamp"] > 500:
+                    break
+
+                if "runic_power" in event:
+                    if next_event.get("runic_power") == stated_rp:
+                        next_event["runic_power"] += 50
+                        # Only add to the waste if it's not already over cap
+                        if next_event[
+                            "type"
+                        ] == "resourcechange" and not next_event.get(
+                            "runic_power_waste"
+                        ):
+                            next_event["runic_power_waste"] = max(
+                                0, next_event["runic_power"] - 1300
+                            )
+                        next_event["runic_power"] = min(1300, next_event["runic_power"])
+
+    return events
+
+
+def coalesce_nested(events):
+    """
+    Fight._coalesce looking ahead through a copy of the rest of the events,
+    up to four times for every cast
+    """
+    coalesced_events = []
+
+    for i, event in enumerate(events):
+        extra = {}
+
+        if event["type"] == "cast":
+            # Check if we're actually hitting a target
+            if event["targetID"] != -1:
+                event["num_targets"] = 1
+                # Go through subsequent events to coalesce miss into this event
+                for next_event in events[i + 1 :]:  # noqa
+                    if (
+                        next_event["type"] == "damage"
+                        and next_event["abilityGameID"] == event["abilityGameID"]
+                        and abs(next_event["timestamp"] - event["timestamp"]) < 100
+                        and next_event.get("sourceInstance")
+                        == event.get("sourceInstance")
+                    ):
+                        if event["targetID"] != next_event["targetID"]:
+                            event["num_targets"] += 1
+                        else:  # only show misses on same target
+                            is_miss = next_event["is_miss"]
+                            hit_type = next_event["hitType"]
+                            extra.update(is_miss=is_miss, hit_type=hit_type)
+                if "is_miss" not in extra:
+                    extra.update(is_miss=False, hit_type="NO_DAMAGE_EVENT")
+
+            # Go through subsequent events to coalesce RP into this event
+            for next_event in events[i + 1 :]:  # noqa
+                if next_event["timestamp"] - event["timestamp"] > 900:
+                    break
+
+                if next_event["runic_power"] != event["runic_power"]:
+                    if next_event["runic_power"] < event["runic_power"]:
+                        break
+
+                    # We want to get the last change event of the group
+                    event["runic_power"] = next_event["runic_power"]
+
+            # Coalesce runic_power_waste
+            for next_event in events[i + 1 :]:  # noqa
+                if next_event["timestamp"] - event["timestamp"] > 900:
+                    break
+
+                if next_event.get("runic_power_waste") and (
+                    next_event["abilityGameID"] == event["abilityGameID"]
+                    or (
+                        event["ability"] == "Obliterate"
+                        and next_event["ability"] == "Fingers of the Damned"
+                    )
+                ):
+                    event["runic_power_waste"] = (
+                        event.get("runic_power_waste", 0)
+                        + next_event["runic_power_waste"]
+                    )
+
+            # Spells like frost strike don't seem to immediately use the RP
+            if event.get("runic_power_cost", 0) > 0:
+                for next_event in events[i + 1 :]:  # noqa
+                    if next_event["runic_power"] != event["runic_power"]:
+                        if next_event["runic_power"] > event["runic_power"]:
+                            break
+                        event["runic_power"] = next_event["runic_power"]
+                        break
+
+            event.update(
+                runic_power_waste=event.get("runic_power_waste", 0),
+                num_targets=event.get("num_targets", 0),
+                **extra,
+            )
+        coalesced_events.append(event)
+    return coalesced_events
+
+
+def calculate_uptime_pairwise(
+    windows, ignore_windows, total_duration, max_duration=None
+):
+    """calculate_uptime intersecting every window with every ignore window"""
+    total_uptime = sum(window.duration for window in windows)
+
+    for window in windows:
+        for ignore_window in ignore_windows:
+            if window.intersects(ignore_window):
+                total_uptime -= window.intersection(ignore_window).duration
+
+    total_duration_without_ignores = total_duration - sum(
+        window.duration for window in ignore_windows
+    )
+    if max_duration is not None:
+        total_duration_without_ignores = min(
+            total_duration_without_ignores,
+            max_duration,
+        )
+
+    if not total_duration_without_ignores:
+        return 0
+    return total_uptime / total_duration_without_ignores
+
+
+class Rune:
+    RUNE_GRACE = 2471
+
+    def __init__(self, full_name, type):
+        self.full_name = full_name
+        self.type = type
+        self.regen_time = None
+        # Flag for death rune (when converted normally)
+        self.is_death = False
+        # Blood Tap is tracked as separate attribute since a blood-tapped
+        # death rune doesn't convert back to blood when used
+        # like a normal death rune does
+        self.blood_tapped = False
+
+    def can_spend(self, timestamp: int):
+        if self.regen_time is None:
+            return True
+        return timestamp >= self.regen_time
+
+    def can_spend_death(self, timestamp: int):
+        return (self.is_death or self.blood_tapped) and self.can_spend(timestamp)
+
+    def _rune_grace_used(self, timestamp):
+        return min(self.RUNE_GRACE, self.time_since_regen(timestamp))
+
+    def refresh(self, timestamp):
+        self.regen_time = timestamp
+
+    def spend(self, timestamp: int, convert: bool):
+        if not self.can_spend(timestamp):
+            return False, 0
+
+        rune_grace_used = self._rune_grace_used(timestamp)
+        rune_grace_wasted = max(0, self.time_since_regen(timestamp) - self.RUNE_GRACE)
+        self.regen_time = timestamp + (10000 - rune_grace_used)
+
+        if convert and not self.blood_tapped:
+            self.convert_to_death()
+        return True, rune_grace_wasted
+
+    def convert_to_death(self):
+        assert not self.blood_tapped
+        self.is_death = True
+
+    def blood_tap(self):
+        assert not self.is_death
+        self.blood_tapped = True
+
+    def stop_blood_tap(self):
+        self.blood_tapped = False
+
+    def spend_death(self, timestamp: int, convert_back: bool):
+        if not self.can_spend_death(timestamp):
+            return False, 0
+
+        spend, rune_grace_wasted = self.spend(timestamp, False)
+        if not spend:
+            return spend, rune_grace_wasted
+
+        if convert_back and not self.blood_tapped:
+            self.is_death = False
+        return spend, rune_grace_wasted
+
+    def get_name(self):
+        if self.is_death or self.blood_tapped:
+            return "Death"
+        return self.type
+
+    def time_since_regen(self, timestamp):
+        if self.regen_time is None:
+            return 0
+        return max(0, timestamp - self.regen_time)
+
+
+class RuneTracker:
+    """
+    The RuneTracker as a Rune object per rune, that events got the list of
+    rune dicts from rather than a RuneSnapshot
+    """
+
+    def __init__(self, should_convert_blood, track_drift_type):
+        self.runes = [
+            Rune("Blood1", "Blood"),
+            Rune("Blood2", "Blood"),
+            Rune("Frost1", "Frost"),
+            Rune("Frost2", "Frost"),
+            Rune("Unholy1", "Unholy"),
+            Rune("Unholy2", "Unholy"),
+        ]
+        self.rune_grace_wasted = 0
+        self.rune_spend_error = False
+        self._should_convert_blood = should_convert_blood
+        self._track_drift_type = track_drift_type
+
+    def set_death_runes(self, is_death):
+        for rune, is_death_ in zip(self.runes, is_death):
+            rune.is_death = is_death_
+
+    @property
+    def current_death_runes(self):
+        return [r for r in self.runes if r.is_death or r.blood_tapped]
+
+    def _sorted_runes(self, runes):
+        runes_ = [(rune, i) for i, rune in enumerate(runes)]
+        runes_sorted = sorted(runes_, key=lambda r: (r[0].regen_time or 0, r[1]))
+        return [rune for rune, _ in runes_sorted]
+
+    def resync_runes(self, timestamp, rune_cost, runes_used):
+        def _resync_runes(runes, num):
+            refreshed = 0
+
+            for rune in self._sorted_runes(runes):
+                if refreshed >= num:
+                    break
+                if not rune.can_spend(timestamp):
+                    rune.refresh(timestamp)
+                refreshed += 1
+
+            return refreshed == num
+
+        total_cost = rune_cost["blood"] + rune_cost["frost"] + rune_cost["unholy"]
+        total_used = runes_used["blood"] + runes_used["frost"] + runes_used["unholy"]
+
+        _resync_runes(self.runes[0:2], runes_used["blood"])
+        _resync_runes(self.runes[2:4], runes_used["frost"])
+        _resync_runes(self.runes[4:6], runes_used["unholy"])
+        _resync_runes(self.current_death_runes, total_cost - total_used)
+
+    def _spend_runes(self, num, runes, timestamp, convert=False):
+        if not num:
+            return True, 0
+
+        spent = 0
+        rune_grace_wasted = 0
+
+        for rune in runes:
+            if spent == num:
+                break
+            # Don't spend deaths here in order to prioritize normal runes,
+            # deaths will be done in next loop
+            if rune.can_spend(timestamp) and not rune.can_spend_death(timestamp):
+                rune_grace_wasted += rune.spend(timestamp, convert)[1]
+                spent += 1
+
+        for rune in self.runes[:2]:
+            if spent == num:
+                break
+            if rune.can_spend_death(timestamp):
+                # Ignore death rune_grace_wasted
+                rune.spend_death(timestamp, convert_back=not convert)
+                spent += 1
+
+                # This handles the case where we use a death rune for a spell
+                # that would convert some runes to death.
+                # The in-game behaviour is that if a death is used instead,
+                # then it finds a rune that could have been converted and does so
+                if convert and rune.blood_tapped:
+                    # A rune should never be both blood tapped and a
+                    # normally converted death rune
+                    assert not rune.is_death
+
+                    # Find the first non-blood-tapped rune and convert it
+                    for rune_ in runes:
+                        if not rune_.is_death and not rune_.blood_tapped:
+                            rune_.convert_to_death()
+                            break
+
+        return spent == num, rune_grace_wasted
+
+    def spend(self, ability, timestamp: int, blood: int, frost: int, unholy: int):
+        convert_blood = self._should_convert_blood and ability in (
+            "Blood Strike",
+            "Pestilence",
+        )
+        blood_spend = self._spend_runes(
+            blood, self.runes[0:2], timestamp, convert_blood
+        )
+        frost_spend = self._spend_runes(frost, self.runes[2:4], timestamp)
+        unholy_spend = self._spend_runes(unholy, self.runes[4:6], timestamp)
+
+        spent = blood_spend[0] and frost_spend[0] and unholy_spend[0]
+        drifts = [
+            v
+            for k, v in zip(
+                ("Blood", "Frost", "Unholy"),
+                (blood_spend[1], frost_spend[1], unholy_spend[1]),
+            )
+            if k in self._track_drift_type
+        ]
+        rune_grace_wasted = max(drifts, default=0)
+        return spent, rune_grace_wasted
+
+    def blood_tap(self, timestamp: int):
+        # Convert one of the runes to a death rune
+        for i in range(2):
+            if not self.runes[i].is_death:
+                self.runes[i].blood_tap()
+                break
+
+        # Refresh the cooldown of one of the runes
+        for i in range(2):
+            if not self.runes[i].can_spend(timestamp):
+                self.runes[i].refresh(timestamp)
+                break
+
+    def stop_blood_tap(self):
+        for i in range(2):
+            if self.runes[i].blood_tapped:
+                self.runes[i].stop_blood_tap()
+                break
+
+    def erw(self, timestamp: int):
+        for i in range(6):
+            if not self.runes[i].can_spend(timestamp):
+                self.runes[i].refresh(timestamp)
+
+    def current_runes(self, timestamp):
+        def _count_rune(i):
+            return 1 if self.runes[i].can_spend(timestamp) else 0
+
+        return {
+            "blood": sum(_count_rune(i) for i in range(0, 2)),
+            "frost": sum(_count_rune(i) for i in range(2, 4)),
+            "unholy": sum(_count_rune(i) for i in range(4, 6)),
+        }
+
+    def _sync(self, event):
+        if event.get("rune_cost"):
+            # Bit of a hack to deal with the logs saying there's no rune
+            # but there actually is. So we only respawn a new rune if we actually need it
+            # http://localhost:5173/?fight=56&source=19&report=4ZtgQYvTyAmbMLDX
+            runes_needed = {}
+            for rune_type, num in self.current_runes(event["timestamp"]).items():
+                runes_used = event["runes_used"]
+                runes_needed[rune_type] = max(num, runes_used[rune_type])
+
+            # Sync runes to what we think they should be
+            self.resync_runes(event["timestamp"], event["rune_cost"], runes_needed)
+
+    def _update(self, event):
+        rune_spend = None
+
+        if event["type"] == "cast":
+            if event.get("rune_cost"):
+                rune_spend = self.spend(
+                    event["ability"],
+                    event["timestamp"],
+                    **event["rune_cost"],
+                )
+
+            if event["ability"] == "Blood Tap":
+                self.blood_tap(event["timestamp"])
+
+            if event["ability"] == "Empower Rune Weapon":
+                self.erw(event["timestamp"])
+
+        if event["type"] == "removebuff" and event["ability"] == "Blood Tap":
+            self.stop_blood_tap()
+
+        return rune_spend
+
+    def simulate(self, event):
+        self._sync(event)
+        rune_spend = self._update(event)
+        return rune_spend is None or rune_spend[0]
+
+    def add_event(self, event):
+        self._sync(event)
+        event["runes_before"] = self._serialize(event["timestamp"])
+
+        rune_spend = self._update(event)
+        if rune_spend is not None:
+            spent, rune_grace_wasted = rune_spend
+            event["rune_spend_error"] = not spent
+            if not spent:
+                self.rune_spend_error = True
+
+            if not event["in_dead_zone"] and (
+                not event["recent_dead_zone"]
+                or event["timestamp"] - event["recent_dead_zone"][1] > 7500
+            ):
+                event["rune_grace_wasted"] = rune_grace_wasted
+                self.rune_grace_wasted += rune_grace_wasted
+
+        event["runes"] = self._serialize(event["timestamp"])
+
+    def _serialize(self, timestamp):
+        return [
+            {
+                "name": rune.get_name(),
+                "is_available": rune.can_spend(timestamp),
+                "regen_time": rune.regen_time,
+            }
+            for rune in self.runes
+        ]
@@ -0,0 +1,25 @@
+"""
+Loads the reports recorded in tests/fixtures, in the shape the WCL client fetches them
+"""
+import json
+import os
+
+from report import Report, Source
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+RECORDED_FIGHTS = ("frost_obliterate", "unholy_gargoyle")
+
+
+def load_recorded(name):
+    with open(os.path.join(FIXTURES_DIR, f"{name}.json")) as f:
+        return json.load(f)
+
+
+def build_report(recorded):
+    """Builds a fresh Report, the fight pipeline updates the events in place"""
+    source = recorded["source"]
+    report = Report(
+        Source(source["id"], source["name"], set(source["pets"])),
+        **json.loads(json.dumps(recorded["report"])),
+    )
+    return report, recorded["fight_id"]
@@ -0,0 +1,24 @@
+import os
+
+from analysis.analyze import _get_analysis_paths
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "src")
+
+
+def test_analysis_version_covers_the_modules_results_depend_on():
+    paths = {os.path.relpath(path, SRC_DIR) for path in _get_analysis_paths()}
+    assert {
+        "analysis/__init__.py",
+        "analysis/analyze.py",
+        "analysis/base.py",
+        "analysis/core_analysis.py",
+        "analysis/frost_analysis.py",
+        "analysis/items.py",
+        "analysis/unholy_analysis.py",
+        "client.py",
+        "console_table.py",
+        "pipeline.py",
+        "report.py",
+    } <= paths
+    # Nothing outside the app, like the modules of installed packages
+    assert all(not path.startswith("..") for path in paths)
@@ -0,0 +1,54 @@
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from cache import DiskCache
+
+
+def _size_on_disk(directory):
+    return sum(
+        entry.stat().st_size
+        for entry in os.scandir(directory)
+        if entry.name.endswith(DiskCache.SUFFIX)
+    )
+
+
+def test_disk_cache_size_counts_overwritten_entries_once(tmp_path):
+    cache = DiskCache(str(tmp_path), 10**6)
+    cache.set("other", list(range(100)))
+    for i in range(10):
+        cache.set("key", list(range(i * 100)))
+
+    assert cache._size == _size_on_disk(tmp_path)
+    assert cache.evictions == 0
+
+
+def test_disk_cache_set_in_background_stores_value_when_called(tmp_path):
+    cache = DiskCache(str(tmp_path), 10**6)
+    combatant_info = {"auras": [{"ability": 48265}], "gear": []}
+
+    async def set_and_modify():
+        write = cache.set_in_background("key", combatant_info)
+        # Like the fight does once the report is built
+        combatant_info["auras"].append({"ability": 48266})
+        combatant_info["gear"] = None
+        await write
+
+    asyncio.run(set_and_modify())
+    assert cache.get("key") == {"auras": [{"ability": 48265}], "gear": []}
+
+
+def test_disk_cache_concurrent_writes_keep_size_in_step(tmp_path):
+    cache = DiskCache(str(tmp_path), 10**6)
+
+    def write(i):
+        cache.set("key", list(range(i * 10)))
+        cache.set(f"key{i % 4}", list(range(i)))
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(write, range(200)))
+
+    assert cache._size == _size_on_disk(tmp_path)
+    assert [
+        entry.name for entry in os.scandir(tmp_path) if entry.name.endswith(".tmp")
+    ] == []
@@ -0,0 +1,236 @@
+import asyncio
+
+import client
+from cache import DiskCache, TTLCache
+from client import WCLClient
+from recorded import load_recorded
+
+
+class FakeResponse:
+    def __init__(self, payload):
+        self._payload = payload
+
+    async def json(self):
+        return self._payload
+
+
+class FakeSession:
+    """
+    Answers with empty events, except that the first page of combatant info
+    and deaths is held until release is set, and is followed by a second page
+    """
+
+    closed = False
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.held = 0
+
+    async def post(self, url, json=None, **kwargs):
+        if "oauth" in url:
+            return FakeResponse({"access_token": "token", "expires_in": 3600})
+
+        query = json["query"]
+        if "rankings(" in query:
+            return FakeResponse(
+                {"data": {"reportData": {"report": {"rankings": {"data": []}}}}}
+            )
+
+        events, next_page_timestamp = [], None
+        if "CombatantInfo" in query or "Deaths" in query:
+            if "startTime: 0" in query:
+                self.held += 1
+                await self.release.wait()
+                next_page_timestamp = 5
+            elif "CombatantInfo" in query:
+                events = [{"timestamp": 5, "type": "combatantinfo", "sourceID": 1}]
+        return FakeResponse(
+            {
+                "data": {
+                    "reportData": {
+                        "report": {
+                            "events": {
+                                "data": events,
+                                "nextPageTimestamp": next_page_timestamp,
+                            }
+                        }
+                    }
+                }
+            }
+        )
+
+
+class ZonesSession:
+    closed = False
+
+    def __init__(self, zones):
+        self.zones = zones
+
+    async def post(self, url, json=None, **kwargs):
+        if "oauth" in url:
+            return FakeResponse({"access_token": "token", "expires_in": 3600})
+        assert "worldData" in json["query"]
+        return FakeResponse({"data": {"worldData": {"zones": self.zones}}})
+
+
+class OfflineSession:
+    closed = False
+
+    async def post(self, url, **kwargs):
+        raise ConnectionError(url)
+
+
+def test_coalesced_fetches_survive_a_cancelled_caller(monkeypatch):
+    session = FakeSession()
+    monkeypatch.setattr(client, "get_session", lambda: session)
+
+    async def fetch_events(source_id):
+        fight_future = asyncio.get_running_loop().create_future()
+        fight_future.set_result({"id": 1, "startTime": 0, "endTime": 100})
+        async with WCLClient("cancelled-caller-test", "secret") as wcl_client:
+            return await wcl_client._fetch_events(
+                "cancelledCallerTest", 1, source_id, fight_future
+            )
+
+    async def run():
+        cancelled = asyncio.create_task(fetch_events(10))
+        surviving = asyncio.create_task(fetch_events(11))
+        # Both wait on the same combatant info and deaths (friendlies and enemies)
+        while session.held < 3:
+            await asyncio.sleep(0)
+
+        cancelled.cancel()
+        await asyncio.gather(cancelled, return_exceptions=True)
+        session.release.set()
+        return cancelled, await surviving
+
+    cancelled, (events, combatant_info, deaths, rankings) = asyncio.run(run())
+
+    assert cancelled.cancelled()
+    assert events == []
+    assert combatant_info == [{"timestamp": 5, "type": "combatantinfo", "sourceID": 1}]
+    assert deaths == []
+    assert rankings == []
+
+
+def test_query_serves_cached_report_without_wcl(tmp_path, monkeypatch):
+    recorded = load_recorded("frost_obliterate")["report"]
+    report_cache = DiskCache(str(tmp_path), 10**7)
+    wcl_client = WCLClient("cached-report-test", "secret", report_cache=report_cache)
+    report_cache.set(
+        ("metadata", "cachedReportTest"),
+        {
+            "endTime": recorded["end_time"],
+            "masterData": {
+                "abilities": recorded["abilities"],
+                "actors": recorded["actors"],
+            },
+            "fights": recorded["fights"],
+        },
+    )
+    report_cache.set(
+        ("events", "cachedReportTest", 3, 10),
+        {
+            key: recorded[key]
+            for key in ("events", "combatant_info", "deaths", "rankings")
+        },
+    )
+
+    # Fetching the zones once stores them on disk too
+    monkeypatch.setattr(WCLClient, "_cache", TTLCache(16, 10**6))
+    monkeypatch.setattr(
+        client,
+        "get_session",
+        lambda: ZonesSession([{"encounters": recorded["encounters"]}]),
+    )
+    asyncio.run(wcl_client._get_zones())
+
+    monkeypatch.setattr(client, "get_session", lambda: OfflineSession())
+    monkeypatch.setattr(WCLClient, "_cache", TTLCache(16, 10**6))
+    report = asyncio.run(wcl_client.query("cachedReportTest", 3, 10))
+    assert report.get_fight(3).encounter.name == "Loatheb"
+
+    # Stale zones are still used while WCL can't be reached
+    monkeypatch.setattr(client, "ZONES_TTL", 0)
+    monkeypatch.setattr(WCLClient, "_cache", TTLCache(16, 10**6))
+    report = asyncio.run(wcl_client.query("cachedReportTest", 3, 10))
+    assert report.get_fight(3).encounter.name == "Loatheb"
+
+
+def test_get_slice_times_covers_rest_of_fight():
+    wcl_client = WCLClient("slices-test", "secret", num_slices=4)
+    fight = {"startTime": 1000, "endTime": 5000}
+
+    assert wcl_client._get_slice_times(fight) == [
+        (0, 2000),
+        (2000, 3000),
+        (3000, 4000),
+        (4000, 100000000000),
+    ]
+    # Resuming after the speculative first page, edges before it are dropped
+    assert wcl_client._get_slice_times(fight, 3500) == [
+        (3500, 3875),
+        (3875, 4250),
+        (4250, 4625),
+        (4625, 100000000000),
+    ]
+    assert wcl_client._get_slice_times(fight, 6000) == [(6000, 100000000000)]
+
+
+def test_stitch_slices_skips_empty_slices():
+    events = [{"timestamp": 1, "type": "cast"}, {"timestamp": 3, "type": "cast"}]
+
+    assert WCLClient._stitch_slices([[], events[:1], [], events[1:], []]) == events
+
+
+def test_stitch_slices_deduplicates_events_on_shared_edge():
+    before = {"timestamp": 1000, "type": "cast", "sourceID": 10}
+    edge = [
+        {"timestamp": 2000, "type": "cast", "sourceID": 10},
+        {"timestamp": 2000, "type": "damage", "sourceID": 10},
+        {"timestamp": 2000, "type": "damage", "sourceID": 10},
+    ]
+    after = {"timestamp": 2001, "type": "cast", "sourceID": 10}
+
+    # Both slices returned the edge events, and only the second returned all of them
+    stitched = WCLClient._stitch_slices([[before] + edge[:2], edge + [after]])
+
+    assert stitched == [before] + edge + [after]
+
+
+def test_fetch_events_stitches_slices_spanning_several_pages(monkeypatch):
+    pages = {}
+    for timestamp in range(0, 100, 5):
+        pages.setdefault(timestamp // 10 * 10, []).append(
+            {"timestamp": timestamp, "type": "cast", "sourceID": 10}
+        )
+
+    async def fetch_events_page(
+        report_code, fight_id, filters, description, semaphore, start_time, end_time
+    ):
+        if "sourceID" not in filters:
+            return [], None
+        # Pages of two events, the last page of a slice repeats its end edge
+        page_start = start_time // 10 * 10
+        page = [event for event in pages.get(page_start, []) if event["timestamp"] >= start_time]
+        next_page_timestamp = page_start + 10
+        if next_page_timestamp >= end_time:
+            page += [event for event in pages.get(end_time, []) if event["timestamp"] == end_time]
+            next_page_timestamp = None
+        return page, next_page_timestamp
+
+    async def query(*args, **kwargs):
+        return {"data": {"reportData": {"report": {"rankings": {"data": []}}}}}
+
+    wcl_client = WCLClient("pages-test", "secret", num_slices=3)
+    monkeypatch.setattr(wcl_client, "_fetch_events_page", fetch_events_page)
+    monkeypatch.setattr(wcl_client, "_query", query)
+
+    async def fetch_events():
+        fight_future = asyncio.get_running_loop().create_future()
+        fight_future.set_result({"id": 1, "startTime": 0, "endTime": 90})
+        return await wcl_client._fetch_events("pagesTest", 1, 10, fight_future)
+
+    events, _, _, _ = asyncio.run(fetch_events())
+
+    assert [event["timestamp"] for event in events] == list(range(0, 100, 5))
@@ -0,0 +1,114 @@
+import random
+
+import pytest
+
+import report
+from legacy import coalesce_nested
+from recorded import RECORDED_FIGHTS, build_report, load_recorded
+from report import Event
+
+ABILITIES = {1: "Obliterate", 2: "Fingers of the Damned", 3: "Frost Strike"}
+
+
+class NestedCoalesceFight(report.Fight):
+    def _coalesce(self, events):
+        return coalesce_nested(events)
+
+
+def _coalesced_events(recorded):
+    fight_report, fight_id = build_report(recorded)
+    return [event.to_dict() for event in fight_report.get_fight(fight_id).events]
+
+
+def _random_events(rng, num_events):
+    """
+    Events spaced right around the horizons of the lookaheads, so damage
+    and RP changes land on either side of them
+    """
+    events = []
+    timestamp = 0
+    runic_power = 500
+
+    for _ in range(num_events):
+        timestamp += rng.choice((0, 0, 1, 99, 100, 101, 450, 899, 900, 901))
+        if rng.random() < 0.4:
+            runic_power = max(
+                0, min(1300, runic_power + rng.choice((-200, 0, 50, 150)))
+            )
+        ability_id = rng.choice(tuple(ABILITIES))
+        event = Event(
+            timestamp=timestamp,
+            type=rng.choice(("cast", "cast", "damage", "resourcechange")),
+            targetID=rng.choice((-1, 50, 51)),
+            abilityGameID=ability_id,
+            ability=ABILITIES[ability_id],
+            runic_power=runic_power,
+        )
+        if rng.random() < 0.3:
+            event.sourceInstance = rng.choice((1, 2))
+        if event.type == "damage":
+            event.update(is_miss=rng.random() < 0.3, hitType=rng.choice((0, 1, 2)))
+        if event.type == "cast" and rng.random() < 0.4:
+            event.runic_power_cost = rng.choice((0, 400))
+        if rng.random() < 0.2:
+            event.runic_power_waste = rng.choice((0, 15, 50))
+        events.append(event)
+
+    return events
+
+
+def _coalesce_fight():
+    fight_report, fight_id = build_report(load_recorded("frost_obliterate"))
+    return fight_report.get_fight(fight_id)
+
+
+@pytest.mark.parametrize("name", RECORDED_FIGHTS)
+def test_coalesce_matches_nested_lookahead(name, monkeypatch):
+    recorded = load_recorded(name)
+    events = _coalesced_events(recorded)
+    with monkeypatch.context() as m:
+        m.setattr(report, "Fight", NestedCoalesceFight)
+        assert events == _coalesced_events(recorded)
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_coalesce_matches_nested_lookahead_at_horizons(seed):
+    fight = _coalesce_fight()
+    events = fight._coalesce(_random_events(random.Random(seed), 200))
+    expected = coalesce_nested(_random_events(random.Random(seed), 200))
+
+    assert [event.to_dict() for event in events] == [
+        event.to_dict() for event in expected
+    ]
+
+
+def test_coalesce_rp_gain_at_horizon():
+    fight = _coalesce_fight()
+
+    def events(gain_after):
+        return [
+            Event(
+                timestamp=0,
+                type="cast",
+                targetID=-1,
+                abilityGameID=1,
+                ability="Obliterate",
+                runic_power=100,
+            ),
+            Event(
+                timestamp=gain_after,
+                type="resourcechange",
+                targetID=-1,
+                abilityGameID=1,
+                ability="Obliterate",
+                runic_power=150,
+            ),
+        ]
+
+    # Gains up to 900ms after the cast are coalesced into it, later ones aren't
+    assert fight._coalesce(events(900))[0].runic_power == 150
+    assert fight._coalesce(events(901))[0].runic_power == 100
+    for gain_after in (899, 900, 901):
+        assert [event.to_dict() for event in fight._coalesce(events(gain_after))] == [
+            event.to_dict() for event in coalesce_nested(events(gain_after))
+        ]
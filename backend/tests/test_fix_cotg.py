@@ -0,0 +1,67 @@
+import copy
+import random
+
+import pytest
+
+import report
+from legacy import fix_cotg_sliced
+from recorded import RECORDED_FIGHTS, build_report, load_recorded
+
+
+class SlicedCotgFight(report.Fight):
+    def _fix_cotg(self, events):
+        return fix_cotg_sliced(list(events))
+
+
+def _normalized_events(recorded):
+    fight_report, fight_id = build_report(recorded)
+    return [event.to_dict() for event in fight_report.get_fight(fight_id).events]
+
+
+def _assert_matches_sliced(recorded, monkeypatch):
+    events = _normalized_events(recorded)
+    with monkeypatch.context() as m:
+        m.setattr(report, "Fight", SlicedCotgFight)
+        assert events == _normalized_events(recorded)
+
+
+def _with_lagging_obliterates(recorded, rng):
+    """
+    Adds Obliterates close enough together for their corrections to overlap,
+    each followed by events that still state the RP from before it
+    """
+    recorded = copy.deepcopy(recorded)
+    events = recorded["report"]["events"]
+    obliterates = [
+        event
+        for event in events
+        if event["type"] == "resourcechange" and event["abilityGameID"] == 51425
+    ]
+    for obliterate in obliterates:
+        for _ in range(rng.randint(0, 3)):
+            timestamp = obliterate["timestamp"] + rng.randint(0, 700)
+            stated_rp = rng.choice((0, 1250, 1300, rng.randrange(0, 1300, 5)))
+            extra = copy.deepcopy(obliterate)
+            extra["timestamp"] = timestamp
+            extra["classResources"][0]["amount"] = stated_rp
+            events.append(extra)
+
+            lagging = copy.deepcopy(extra)
+            lagging["type"] = rng.choice(("resourcechange", "cast"))
+            lagging["timestamp"] = timestamp + rng.randint(0, 600)
+            events.append(lagging)
+    events.sort(key=lambda event: event["timestamp"])
+    return recorded
+
+
+@pytest.mark.parametrize("name", RECORDED_FIGHTS)
+def test_fix_cotg_matches_sliced_lookahead(name, monkeypatch):
+    _assert_matches_sliced(load_recorded(name), monkeypatch)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_fix_cotg_matches_sliced_lookahead_overlapping(seed, monkeypatch):
+    recorded = _with_lagging_obliterates(
+        load_recorded("frost_obliterate"), random.Random(seed)
+    )
+    _assert_matches_sliced(recorded, monkeypatch)
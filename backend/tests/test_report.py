@@ -0,0 +1,22 @@
+import copy
+
+from recorded import load_recorded
+from report import Report, Source
+
+
+def test_get_combatant_info_leaves_raw_combatant_info_untouched():
+    recorded = load_recorded("frost_obliterate")
+    source = recorded["source"]
+    # Like the client, which shares the list with concurrent queries and the cache
+    raw_combatant_info = recorded["report"]["combatant_info"]
+    expected = copy.deepcopy(raw_combatant_info)
+    report = Report(
+        Source(source["id"], source["name"], set(source["pets"])), **recorded["report"]
+    )
+    fight = report.get_fight(recorded["fight_id"])
+
+    combatant_info = fight.get_combatant_info(report.source.id)
+
+    assert raw_combatant_info == expected
+    assert all("name" in aura for aura in combatant_info["auras"])
+    assert all("item_icon" in gear for gear in combatant_info["gear"])
@@ -0,0 +1,200 @@
+import random
+
+import pytest
+
+import legacy
+from analysis.core_analysis import RuneTracker
+from recorded import RECORDED_FIGHTS, build_report, load_recorded
+from report import Event
+
+# (blood, frost, unholy) rune cost of the abilities, None for those without one
+ABILITY_COSTS = {
+    "Obliterate": (0, 1, 1),
+    "Howling Blast": (0, 1, 1),
+    "Scourge Strike": (0, 1, 1),
+    "Death and Decay": (1, 1, 1),
+    "Blood Strike": (1, 0, 0),
+    "Pestilence": (1, 0, 0),
+    "Blood Boil": (1, 0, 0),
+    "Icy Touch": (0, 1, 0),
+    "Plague Strike": (0, 0, 1),
+    "Death Coil": None,
+    "Horn of Winter": None,
+    "Blood Tap": None,
+    "Empower Rune Weapon": None,
+}
+# (should_convert_blood, track_drift_type) of the specs' rune trackers
+TRACKER_CONFIGS = (
+    (True, {"Frost", "Unholy"}),
+    (False, {"Blood", "Frost", "Unholy"}),
+)
+DEATH_RUNE_STATES = ((False, False), (True, False), (False, True), (True, True))
+
+
+def _rune_state(tracker):
+    runes = tracker.runes
+    if isinstance(tracker, legacy.RuneTracker):
+        return [
+            (rune.get_name(), rune.regen_time, rune.is_death, rune.blood_tapped)
+            for rune in runes
+        ]
+    return [
+        (
+            runes.get_name(i),
+            runes.regen_time[i],
+            runes.is_death[i],
+            runes.blood_tapped[i],
+        )
+        for i in range(6)
+    ]
+
+
+def _make_trackers(config, death_runes):
+    trackers = RuneTracker(*config), legacy.RuneTracker(*config)
+    for tracker in trackers:
+        tracker.set_death_runes(death_runes)
+    return trackers
+
+
+def _random_rune_cost(rng, ability):
+    cost = ABILITY_COSTS[ability]
+    if not cost:
+        return None, None
+    rune_cost = dict(zip(("blood", "frost", "unholy"), cost))
+    # The runes the log says were used, death runes make up the rest
+    runes_used = {
+        rune_type: rng.randint(0, num) for rune_type, num in rune_cost.items()
+    }
+    return rune_cost, runes_used
+
+
+def _random_event_fields(rng, num_events):
+    timestamp = 0
+    events = []
+    for _ in range(num_events):
+        timestamp += rng.choice((0, rng.randint(1, 3000), rng.randint(3000, 15000)))
+        kind = rng.random()
+        if kind < 0.8:
+            ability = rng.choice(list(ABILITY_COSTS))
+            rune_cost, runes_used = _random_rune_cost(rng, ability)
+            fields = dict(
+                type="cast", ability=ability, rune_cost=rune_cost, runes_used=runes_used
+            )
+        elif kind < 0.9:
+            fields = dict(type="removebuff", ability="Blood Tap")
+        else:
+            fields = dict(type="damage", ability="Melee")
+
+        recent_dead_zone = None
+        if rng.random() < 0.2:
+            start = timestamp - rng.randint(0, 20000)
+            recent_dead_zone = (start, start + rng.randint(2000, 20000))
+        events.append(
+            dict(
+                fields,
+                timestamp=timestamp,
+                in_dead_zone=rng.random() < 0.05,
+                recent_dead_zone=recent_dead_zone,
+            )
+        )
+    return events
+
+
+def _assert_add_event_matches(tracker, legacy_tracker, events, legacy_events):
+    for event, legacy_event in zip(events, legacy_events):
+        tracker.add_event(event)
+        legacy_tracker.add_event(legacy_event)
+
+        assert event.runes_before.serialize() == legacy_event.runes_before
+        assert event.runes.serialize() == legacy_event.runes
+        assert event.get("rune_spend_error") == legacy_event.get("rune_spend_error")
+        assert event.get("rune_grace_wasted") == legacy_event.get("rune_grace_wasted")
+        assert _rune_state(tracker) == _rune_state(legacy_tracker)
+
+    assert tracker.rune_grace_wasted == legacy_tracker.rune_grace_wasted
+    assert tracker.rune_spend_error == legacy_tracker.rune_spend_error
+
+
+@pytest.mark.parametrize("config", TRACKER_CONFIGS)
+@pytest.mark.parametrize("death_runes", DEATH_RUNE_STATES)
+@pytest.mark.parametrize("seed", range(10))
+def test_add_event_matches_per_rune_tracker(seed, death_runes, config):
+    event_fields = _random_event_fields(random.Random(seed), 300)
+    _assert_add_event_matches(
+        *_make_trackers(config, death_runes),
+        [Event(**fields) for fields in event_fields],
+        [Event(**fields) for fields in event_fields],
+    )
+
+
+@pytest.mark.parametrize("config", TRACKER_CONFIGS)
+@pytest.mark.parametrize("death_runes", DEATH_RUNE_STATES)
+@pytest.mark.parametrize("seed", range(10))
+def test_simulate_matches_per_rune_tracker(seed, death_runes, config):
+    tracker, legacy_tracker = _make_trackers(config, death_runes)
+    for fields in _random_event_fields(random.Random(seed), 300):
+        assert tracker.simulate(Event(**fields)) == legacy_tracker.simulate(
+            Event(**fields)
+        )
+        assert _rune_state(tracker) == _rune_state(legacy_tracker)
+
+
+@pytest.mark.parametrize("config", TRACKER_CONFIGS)
+@pytest.mark.parametrize("seed", range(20))
+def test_updates_match_per_rune_tracker(seed, config):
+    rng = random.Random(seed)
+    trackers = _make_trackers(config, rng.choice(DEATH_RUNE_STATES))
+
+    timestamp = 0
+    for _ in range(300):
+        timestamp += rng.randint(0, 4000)
+        update = rng.choice(("spend", "blood_tap", "stop_blood_tap", "erw", "resync"))
+        if update == "spend":
+            ability = rng.choice([a for a, cost in ABILITY_COSTS.items() if cost])
+            rune_cost, _ = _random_rune_cost(rng, ability)
+            results = [
+                tracker.spend(ability, timestamp, **rune_cost) for tracker in trackers
+            ]
+        elif update == "blood_tap":
+            results = [tracker.blood_tap(timestamp) for tracker in trackers]
+        elif update == "stop_blood_tap":
+            results = [tracker.stop_blood_tap() for tracker in trackers]
+        elif update == "erw":
+            results = [tracker.erw(timestamp) for tracker in trackers]
+        else:
+            rune_cost, runes_used = _random_rune_cost(rng, "Death and Decay")
+            results = [
+                tracker.resync_runes(timestamp, rune_cost, runes_used)
+                for tracker in trackers
+            ]
+            assert trackers[0].current_runes(timestamp) == trackers[1].current_runes(
+                timestamp
+            )
+
+        assert results[0] == results[1]
+        assert _rune_state(trackers[0]) == _rune_state(trackers[1])
+
+
+def _source_events(recorded):
+    report, fight_id = build_report(recorded)
+    events = [
+        event
+        for event in report.get_fight(fight_id).events
+        if event.sourceID == report.source.id
+    ]
+    for event in events:
+        event.in_dead_zone = False
+        event.recent_dead_zone = None
+    return events
+
+
+@pytest.mark.parametrize("config", TRACKER_CONFIGS)
+@pytest.mark.parametrize("death_runes", DEATH_RUNE_STATES)
+@pytest.mark.parametrize("name", RECORDED_FIGHTS)
+def test_recorded_fight_matches_per_rune_tracker(name, death_runes, config):
+    recorded = load_recorded(name)
+    events = _source_events(recorded)
+    assert any(event.get("rune_cost") for event in events)
+    _assert_add_event_matches(
+        *_make_trackers(config, death_runes), events, _source_events(recorded)
+    )
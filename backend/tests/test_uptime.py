@@ -0,0 +1,35 @@
+import random
+
+import pytest
+
+from analysis.base import Window, calculate_uptime
+from legacy import calculate_uptime_pairwise
+
+FIGHT_DURATION = 300000
+
+
+def _random_windows(rng, num_windows, max_duration):
+    windows = []
+    for _ in range(num_windows):
+        start = rng.randrange(FIGHT_DURATION)
+        windows.append(Window(start, start + rng.randint(0, max_duration)))
+    return windows
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_calculate_uptime_matches_pairwise(seed):
+    rng = random.Random(seed)
+    # Long enough for the windows and the ignore windows to overlap among themselves
+    windows = _random_windows(rng, rng.randint(0, 40), 30000)
+    ignore_windows = _random_windows(rng, rng.randint(0, 20), 20000)
+    # Windows that touch count as intersecting
+    windows.extend(
+        Window(window.end, window.end + 1000) for window in ignore_windows[:3]
+    )
+    max_duration = rng.choice((None, FIGHT_DURATION // 2))
+
+    assert calculate_uptime(
+        windows, ignore_windows, FIGHT_DURATION, max_duration
+    ) == calculate_uptime_pairwise(
+        windows, ignore_windows, FIGHT_DURATION, max_duration
+    )
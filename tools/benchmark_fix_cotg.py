@@ -0,0 +1,86 @@
+"""
+Benchmark of the curse of the grave fix over longer and longer fights, against
+the previous pass that looked ahead through a copy of the rest of the fight for
+every Obliterate. That copying made both the time per event and the peak
+working memory grow with the length of the fight.
+Run from backend: PYTHONPATH=src:tests python ../tools/benchmark_fix_cotg.py
+"""
+import functools
+import time
+import tracemalloc
+from collections import deque
+
+from legacy import fix_cotg_sliced
+from recorded import build_report, load_recorded
+
+FIGHT_REPEATS = (1, 4, 16, 64)
+
+
+def _repeat_events(events, num_repeats):
+    duration = events[-1]["timestamp"] - events[0]["timestamp"] + 1000
+    return [
+        {**event, "timestamp": event["timestamp"] + i * duration}
+        for i in range(num_repeats)
+        for event in events
+    ]
+
+
+def _normalize_events(fight, raw_events):
+    # Normalizing takes the raw events out of the list it's given
+    return list(fight._normalize_events(list(raw_events)))
+
+
+def _measure(fix_cotg, make_events):
+    """
+    Time and peak working memory of a pass, traced separately as tracing is slow.
+    The working memory leaves out what the pass keeps on the events (the updated RP).
+    """
+    events = make_events()
+    start = time.perf_counter()
+    fix_cotg(events)
+    seconds = time.perf_counter() - start
+
+    events = make_events()
+    tracemalloc.start()
+    fix_cotg(events)
+    end_memory, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return seconds, peak_memory - end_memory
+
+
+def _report(name, num_events, seconds, working_memory):
+    print(
+        f"{name:<20} {num_events:>8} events"
+        f" {seconds / num_events * 1e6:8.2f} us/event"
+        f" {working_memory / 1024:10.1f} KiB working memory"
+    )
+
+
+def main():
+    recorded = load_recorded("frost_obliterate")
+    report, fight_id = build_report(recorded)
+    fight = report.get_fight(fight_id)
+
+    for num_repeats in FIGHT_REPEATS:
+        raw_events = _repeat_events(recorded["report"]["events"], num_repeats)
+        # The passes update the events in place, so each run gets its own copy
+        make_events = functools.partial(_normalize_events, fight, raw_events)
+
+        # Drained the way the pipeline streams it, without collecting the events
+        _report(
+            "Fight._fix_cotg",
+            len(raw_events),
+            *_measure(
+                lambda events: deque(fight._fix_cotg(iter(events)), maxlen=0),
+                make_events,
+            ),
+        )
+        _report(
+            "sliced lookahead",
+            len(raw_events),
+            *_measure(fix_cotg_sliced, make_events),
+        )
+
+
+if __name__ == "__main__":
+    main()
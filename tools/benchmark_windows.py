@@ -0,0 +1,102 @@
+"""
+Micro-benchmark of the buff window and dead zone lookups.
+Run from backend/src: PYTHONPATH=. python ../../tools/benchmark_windows.py
+"""
+import random
+import timeit
+
+from analysis.base import IntervalSet, calculate_uptime
+from analysis.core_analysis import BuffWindows, DeadZoneAnalyzer
+
+NUM_WINDOWS = 1000
+NUM_LOOKUPS = 10000
+FIGHT_DURATION = NUM_WINDOWS * 1000
+
+
+def _make_buff_windows():
+    buff_windows = BuffWindows(
+        "Unholy Strength", 53365, "spell_holy_blessingofstrength"
+    )
+    for i in range(NUM_WINDOWS):
+        start = i * 1000 + random.randint(0, 300)
+        buff_windows.add_window(start, start + random.randint(100, 600))
+    return buff_windows
+
+
+class _Encounter:
+    name = "Loatheb"
+
+
+class _Fight:
+    encounter = _Encounter()
+    is_hard_mode = False
+
+
+def _make_dead_zone_analyzer():
+    dead_zone_analyzer = DeadZoneAnalyzer(_Fight())
+    for i in range(NUM_WINDOWS):
+        start = i * 1000 + random.randint(0, 300)
+        dead_zone_analyzer._dead_zones.append(
+            DeadZoneAnalyzer.DeadZone(start, start + random.randint(100, 600))
+        )
+    return dead_zone_analyzer
+
+
+def _report(name, seconds, num_calls):
+    print(f"{name:<40} {seconds / num_calls * 1e6:8.2f} us/call")
+
+
+def main():
+    random.seed(0)
+    timestamps = sorted(random.randrange(FIGHT_DURATION) for _ in range(NUM_LOOKUPS))
+
+    buff_windows = _make_buff_windows()
+    _report(
+        "BuffWindows.contains",
+        timeit.timeit(lambda: [buff_windows.contains(t) for t in timestamps], number=1),
+        NUM_LOOKUPS,
+    )
+
+    dead_zone_analyzer = _make_dead_zone_analyzer()
+    _report(
+        "DeadZoneAnalyzer.get_recent_dead_zone",
+        timeit.timeit(
+            lambda: [dead_zone_analyzer.get_recent_dead_zone(t) for t in timestamps],
+            number=1,
+        ),
+        NUM_LOOKUPS,
+    )
+
+    windows = list(buff_windows.windows)
+    dead_zones = dead_zone_analyzer.get_dead_zones()
+    _report(
+        "calculate_uptime",
+        timeit.timeit(
+            lambda: calculate_uptime(windows, dead_zones, FIGHT_DURATION), number=10
+        ),
+        10,
+    )
+
+    interval_set = IntervalSet(windows)
+    _report(
+        "IntervalSet.clamp",
+        timeit.timeit(
+            lambda: [interval_set.clamp(t, t + 30000) for t in timestamps[::10]],
+            number=1,
+        ),
+        NUM_LOOKUPS // 10,
+    )
+    _report(
+        "Window.contains (linear scan)",
+        timeit.timeit(
+            lambda: [
+                any(window.contains(t) for window in windows) for t in timestamps[::10]
+            ],
+            number=1,
+        ),
+        NUM_LOOKUPS // 10,
+    )
+
+
+if __name__ == "__main__":
+    main()